@@ -0,0 +1,124 @@
+"""Return-stats core shared by calc_overnight_stats and calc_overnight_stats_we: the daily log returns from the
+reference prices, a Numba kernel for the column-wise stats and cumulative $1 series of a 2D log-return table
+(rows = trade dates, NaN = no return that day), the annualization of its outputs and their display formatting."""
+from math import sqrt
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from numba import njit
+
+TRADING_DAYS = 252
+
+# Row labels of the (5, n_columns) table returned by annualize / log_table_stats
+STAT_ROWS = [
+    'Final value of $1',
+    'Daily Mean Ret (%)',
+    'Annual Mean Ret (%)',
+    'Annual StdDev(%)',
+    'Ann Sharpe Ratio'  # decimal, not percent
+]
+
+
+def log_returns(po: np.ndarray, pc: np.ndarray, pp: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (intraday, overnight) log returns from the open, close and previous-close price arrays, NaN = no return.
+    NaN inputs (NULL prices) propagate through the logs on their own, so only the zero denominators and the
+    missing prev_close need explicit masking.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # One log per price column; the returns are differences of logs (no divisions)
+        log_po, log_pc, log_pp = np.log(po), np.log(pc), np.log(pp)
+        # intraday: ln(close / open) only when prev_close exists (per requirement)
+        intraday = np.where((po != 0) & ~np.isnan(pp), log_pc - log_po, np.nan)
+        # overnight: ln(open / prev_close)
+        overnight = np.where(pp != 0, log_po - log_pp, np.nan)
+    return intraday, overnight
+
+
+# fastmath without 'nnan'/'ninf': the loop relies on isnan() to skip missing days.
+@njit(cache=True, fastmath={'nsz', 'arcp', 'contract', 'reassoc'})
+def compute(log_arr: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    One pass per column of log_arr (float64[:, :]).
+    Return (final, daily_mean, daily_std, cum, count):
+      - final: value of $1 at the end (exp of the summed log returns), NaN for an empty column
+      - daily_mean / daily_std: mean and std of the simple returns (decimal; Welford, ddof=1, or 0 for a single day)
+      - cum: cumulative $1 series exp(running sum of log returns), 1.0 up to and including the first day
+             with a return, carried forward over missing days, all NaN for an empty column
+      - count: number of days with a return
+    """
+    n_rows, n_cols = log_arr.shape
+    final = np.full(n_cols, np.nan)
+    daily_mean = np.full(n_cols, np.nan)
+    daily_std = np.full(n_cols, np.nan)
+    cum = np.full((n_rows, n_cols), np.nan)
+    count = np.zeros(n_cols, dtype=np.int64)
+
+    for j in range(n_cols):
+        n = 0
+        log_sum = 0.0
+        mean = 0.0  # running mean of the simple returns (Welford)
+        m2 = 0.0  # running sum of squared deviations (Welford)
+        for i in range(n_rows):
+            x = log_arr[i, j]
+            if not np.isnan(x):
+                log_sum += x
+                n += 1
+                r = np.expm1(x)
+                delta = r - mean
+                mean += delta / n
+                m2 += delta * (r - mean)
+                if n == 1:
+                    cum[:i + 1, j] = 1.0
+                else:
+                    cum[i, j] = np.exp(log_sum)
+            elif n > 0:
+                cum[i, j] = np.exp(log_sum)  # missing day: carry the accumulated value forward
+        count[j] = n
+        if n == 0:
+            continue
+
+        final[j] = np.exp(log_sum)
+        daily_mean[j] = mean
+        daily_std[j] = np.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+
+    return final, daily_mean, daily_std, cum, count
+
+
+def annualize(final_value: np.ndarray, daily_mean: np.ndarray, daily_std: np.ndarray,
+              n: np.ndarray) -> np.ndarray:
+    """
+    Annualize the per-column kernel outputs (final value, daily mean/std of simple returns, day counts).
+    Returns a (5, n_columns) array with rows STAT_ROWS:
+    (final_value, daily_mean_pct, annual_mean_pct, annual_std_pct, ann_sharpe_decimal).
+    """
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        daily_mean_pct = daily_mean * 100.0
+
+        annual_mean_decimal = np.where(final_value > 0, final_value ** (TRADING_DAYS / n) - 1.0, np.nan)
+        annual_mean_pct = annual_mean_decimal * 100.0
+
+        annual_std_decimal = daily_std * sqrt(TRADING_DAYS)
+        annual_std_pct = annual_std_decimal * 100.0
+
+        # Sharpe (risk-free = 0) -> decimal (not percent)
+        ann_sharpe = np.where((annual_std_decimal == 0) | np.isnan(annual_mean_decimal), np.nan,
+                              annual_mean_decimal / annual_std_decimal)
+
+    return np.vstack([final_value, daily_mean_pct, annual_mean_pct, annual_std_pct, ann_sharpe])
+
+
+def log_table_stats(log_arr: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (stats, cum) for a (n_days, n_columns) log-return table: the (5, n_columns) annualized stats
+    (rows STAT_ROWS) and the (n_days, n_columns) cumulative $1 series, from a single compiled pass."""
+    final_value, daily_mean, daily_std, cum, count = compute(np.ascontiguousarray(log_arr, dtype=np.float64))
+    return annualize(final_value, daily_mean, daily_std, count), cum
+
+
+def format_stats(numeric_df: pd.DataFrame) -> pd.DataFrame:
+    """Display copy of a stats frame: every value formatted to 3 decimals ("nan" for missing stats) in one
+    vectorized call, same index and columns."""
+    vals = numeric_df.to_numpy(dtype=np.float64)
+    formatted = np.where(np.isnan(vals), 'nan', np.char.mod('%.3f', vals))
+    return pd.DataFrame(formatted, index=numeric_df.index, columns=numeric_df.columns, dtype="string")
@@ -1,19 +1,16 @@
+import os
 import sys
 import sqlite3
+import threading
 import argparse
+import functools
 import logging
 from pathlib import Path
-from math import sqrt
-from typing import Tuple
+from typing import Dict, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 
-# Silence verbose font discovery messages from matplotlib
-logging.getLogger("matplotlib.font_manager").setLevel(logging.WARNING)
-import matplotlib.pyplot as plt
-import seaborn as sns
-
 # Ensure project `src` root is on sys.path when executed as a script.
 _script_dir = Path(__file__).resolve().parent
 _project_src = _script_dir.parent
@@ -21,21 +18,63 @@ if str(_project_src) not in sys.path:
     sys.path.insert(0, str(_project_src))
 
 from python.config import DB_PATH
+from python._stats_core import STAT_ROWS, format_stats, log_returns, log_table_stats
+
+# Row layout of the reference prices as read from daily_reference_prices (NULL prices become NaN).
+# Prices stay float64 as stored: numeric_df is written to XLSX unrounded, so float32 inputs would show up there.
+_PRICE_DTYPE = [('trade_date', 'U10'), ('po', 'f8'), ('pc', 'f8'), ('pp', 'f8')]
+
+_local = threading.local()
 
-TRADING_DAYS = 252
+
+def _get_conn(db_path: str) -> sqlite3.Connection:
+    """
+    Return this thread's connection to `db_path`, opening it on first use with PRAGMAs tuned for
+    repeated reads (64 MiB page cache, 256 MiB memory map). The connection is reused, not closed.
+    Keyed by process id too, so a forked worker never reuses its parent's handle.
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    key = (os.getpid(), db_path)
+    conn = conns.get(key)
+    if conn is None:
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conns[key] = conn
+    return conn
+
+
+@functools.lru_cache(maxsize=None)
+def _descriptions(db_path: str) -> Dict[str, str]:
+    """{symbol_code: description} for every symbol in `rollover_rules`, loaded with one query and cached per process."""
+    try:
+        cur = _get_conn(db_path).cursor()
+        cur.execute("SELECT symbol_code, description FROM rollover_rules")
+        return {sym: desc for sym, desc in cur.fetchall() if desc}
+    except Exception:
+        return {}
 
 
-def compute_reference_stats(db_path: str, symbol: str, start_date: str, end_date: str) -> Tuple[
-    pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+def compute_reference_stats(db_path: str, symbol: str, start_date: str, end_date: str,
+                            description: str = None, conn: sqlite3.Connection = None,
+                            return_returns: bool = False) -> Tuple[
+    pd.DataFrame, pd.DataFrame, Optional[pd.DataFrame], pd.DataFrame]:
     """
     Returns:
       - display_df: pretty DataFrame (strings) with top-level header "<description> (<symbol>) stats"
       - numeric_df: numeric DataFrame (float) with identical layout for downstream use
-      - returns_df: log-return series indexed by trade_date (columns: full_log, intraday_log, overnight_log)
+      - returns_df: log-return series indexed by trade_date (columns: full_log, intraday_log, overnight_log);
+        only built when `return_returns` is True, else None
       - cum_df: cumulative $1 series for plotting (columns: Full, Intraday, Overnight), indexed by trade_date
-    Description is taken from `rollover_rules.description` (falls back to `symbol`).
+    Description is taken from `rollover_rules.description` (falls back to `symbol`) unless passed in.
+    Reads through `conn` if given, else through the shared per-thread connection for `db_path`.
     """
-    conn = sqlite3.connect(db_path)
+    if conn is None:
+        conn = _get_conn(db_path)
     sql = """
         SELECT trade_date, price_open, price_close, prev_close
         FROM daily_reference_prices
@@ -43,155 +82,132 @@ def compute_reference_stats(db_path: str, symbol: str, start_date: str, end_date
           AND trade_date BETWEEN ? AND ?
         ORDER BY trade_date
     """
-    df = pd.read_sql_query(sql, conn, params=(symbol, start_date, end_date))
+    cur = conn.execute(sql, (symbol, start_date, end_date))
+    prices = np.array(cur.fetchall(), dtype=_PRICE_DTYPE)
 
-    # Fetch description from rollover_rules (fallback to symbol if missing)
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT description FROM rollover_rules WHERE symbol_code = ?", (symbol,))
-        row = cur.fetchone()
-        description = row[0] if row and row[0] else symbol
-    except Exception:
-        description = symbol
-
-    conn.close()
-
-    # intraday: ln(close / open) only when prev_close exists (per requirement)
-    df['intraday_log'] = np.where(
-        (df['price_open'].notna()) &
-        (df['price_close'].notna()) &
-        (df['price_open'] != 0) &
-        (df['prev_close'].notna()),
-        np.log(df['price_close'] / df['price_open']),
-        np.nan
-    )
+    if description is None:
+        description = _descriptions(db_path).get(symbol, symbol)
 
-    # overnight: ln(open / prev_close)
-    df['overnight_log'] = np.where(
-        (df['price_open'].notna()) & (df['prev_close'].notna()) & (df['prev_close'] != 0),
-        np.log(df['price_open'] / df['prev_close']),
-        np.nan
-    )
+    return _stats_from_prices(prices, symbol, description, return_returns)
 
-    # full = intraday + overnight
-    df['full_log'] = df['intraday_log'] + df['overnight_log']
 
-    def stats_from_log_series(log_series: pd.Series) -> Tuple[float, float, float, float, float]:
-        """Return (final_value, daily_mean_pct, annual_mean_pct, annual_std_pct, ann_sharpe_decimal)."""
-        s = log_series.dropna()
-        n = len(s)
-        if n == 0:
-            return (np.nan, np.nan, np.nan, np.nan, np.nan)
+def compute_all_reference_stats(db_path: str, symbols: Sequence[str], conn: sqlite3.Connection = None,
+                                return_returns: bool = False) -> Dict[
+    str, Tuple[pd.DataFrame, pd.DataFrame, Optional[pd.DataFrame], pd.DataFrame]]:
+    """
+    Batch version of compute_reference_stats over the full date range of each symbol.
+    Loads all requested symbols with one query (descriptions come from the cached rollover_rules map) and returns
+    {symbol: (display_df, numeric_df, returns_df, cum_df)}. Symbols without rows are omitted.
+    `conn` and `return_returns` are used as in compute_reference_stats.
+    """
+    symbols = list(symbols)
+    if not symbols:
+        return {}
+    placeholders = ", ".join("?" * len(symbols))
+
+    if conn is None:
+        conn = _get_conn(db_path)
+    sql = f"""
+        SELECT symbol_code, trade_date, price_open, price_close, prev_close
+        FROM daily_reference_prices
+        WHERE symbol_code IN ({placeholders})
+        ORDER BY symbol_code, trade_date
+    """
+    cur = conn.execute(sql, symbols)
+    rows = np.array(cur.fetchall(), dtype=[('symbol_code', 'O')] + _PRICE_DTYPE)
 
-        simple = np.exp(s.values) - 1.0
-        final_value = float(np.prod(1.0 + simple))
-        daily_mean_pct = float(np.nanmean(simple)) * 100.0
+    # Descriptions from rollover_rules (fallback to symbol if missing)
+    descriptions = _descriptions(db_path)
 
-        if final_value <= 0:
-            annual_mean_pct = np.nan
-            annual_mean_decimal = np.nan
-        else:
-            annual_mean_decimal = final_value ** (TRADING_DAYS / n) - 1.0
-            annual_mean_pct = float(annual_mean_decimal * 100.0)
+    # Rows are ordered by symbol_code: split at the positions where the symbol changes
+    results = {}
+    starts = np.flatnonzero(rows['symbol_code'][1:] != rows['symbol_code'][:-1]) + 1
+    for prices in np.split(rows, starts) if len(rows) else []:
+        symbol = prices['symbol_code'][0]
+        try:
+            results[symbol] = _stats_from_prices(prices, symbol, descriptions.get(symbol, symbol),
+                                                 return_returns)
+        except Exception:
+            logging.exception("Failed to compute stats for %s; skipping", symbol)
+    return results
 
-        ddof = 1 if n > 1 else 0
-        daily_std = float(np.std(simple, ddof=ddof))
-        annual_std_decimal = daily_std * sqrt(TRADING_DAYS)
-        annual_std_pct = annual_std_decimal * 100.0
 
-        # Sharpe (risk-free = 0) -> decimal (not percent)
-        if annual_std_decimal == 0 or np.isnan(annual_mean_decimal):
-            ann_sharpe = np.nan
-        else:
-            ann_sharpe = annual_mean_decimal / annual_std_decimal
-
-        return (final_value, daily_mean_pct, annual_mean_pct, annual_std_pct, ann_sharpe)
-
-    full_stats = stats_from_log_series(df['full_log'])
-    intraday_stats = stats_from_log_series(df['intraday_log'])
-    overnight_stats = stats_from_log_series(df['overnight_log'])
-
-    rows = [
-        'Final value of $1',
-        'Daily Mean Ret (%)',
-        'Annual Mean Ret (%)',
-        'Annual StdDev(%)',
-        'Ann Sharpe Ratio'  # decimal, not percent
-    ]
-
-    numeric_df = pd.DataFrame(
-        data={
-            'Full': full_stats,
-            'Intraday': intraday_stats,
-            'Overnight': overnight_stats
-        },
-        index=rows
-    )
+def _stats_from_prices(prices: np.ndarray, symbol: str, description: str, return_returns: bool = False) -> Tuple[
+    pd.DataFrame, pd.DataFrame, Optional[pd.DataFrame], pd.DataFrame]:
+    """
+    Core of compute_reference_stats: `prices` is a structured array with fields trade_date, po, pc, pp
+    (see _PRICE_DTYPE) ordered by trade_date. Returns (display_df, numeric_df, returns_df, cum_df).
+    """
+    intraday, overnight = log_returns(prices['po'], prices['pc'], prices['pp'])
 
-    # Format for display (3 decimals). Keep numeric_df separate for programmatic use.
-    def fmt_cell(x):
-        if x is None or (isinstance(x, float) and np.isnan(x)):
-            return "nan"
-        return f"{x:.3f}"
+    # full = intraday + overnight; stats and cumulative $1 series of all three in a single compiled pass
+    log_arr = np.column_stack((intraday + overnight, intraday, overnight))
+    stats, cum = log_table_stats(log_arr)
+
+    numeric_df = pd.DataFrame(stats, index=STAT_ROWS, columns=['Full', 'Intraday', 'Overnight'])
 
-    # elementwise formatting using Series.map via stack/unstack (avoids DataFrame.applymap)
-    display_df = numeric_df.copy()
-    display_df = display_df.stack().map(fmt_cell).unstack()
+    # Format for display (3 decimals). Keep numeric_df separate for programmatic use.
+    display_df = format_stats(numeric_df)
 
     # Put top-level label "<description> (<symbol>) stats" above the three columns (MultiIndex)
     top_label = f"{description} ({symbol}) stats"
     display_df.columns = pd.MultiIndex.from_product([[top_label], display_df.columns])
     numeric_df.columns = pd.MultiIndex.from_product([[top_label], numeric_df.columns])
 
-    # Build returns DataFrame indexed by trade_date for plotting
-    returns_df = df[['trade_date', 'full_log', 'intraday_log', 'overnight_log']].copy()
-    returns_df['trade_date'] = pd.to_datetime(returns_df['trade_date'])
-    returns_df = returns_df.set_index('trade_date')
-
-    # Compute cumulative $1 series for each return type
-    cum_df = pd.DataFrame(index=returns_df.index)
-    for col, name in [('full_log', 'Full'), ('intraday_log', 'Intraday'), ('overnight_log', 'Overnight')]:
-        s = returns_df[col]
-        valid = s.dropna()
-        if valid.empty:
-            cum_df[name] = np.nan
-            continue
+    # trade_date index shared by the returns/cumulative frames
+    # (trade_date is stored as ISO 'YYYY-MM-DD', so a typed cast replaces the general date parser)
+    dates = pd.DatetimeIndex(prices['trade_date'].astype('datetime64[D]'), name='trade_date')
+
+    cum_df = pd.DataFrame(cum, index=dates, columns=['Full', 'Intraday', 'Overnight'])
 
-        # cumulative value on days with defined returns: cum = exp(cumsum(log_returns))
-        cum_valid = np.exp(valid.cumsum())
-        # Reindex to full index, forward-fill so plot shows most recent accumulated value on subsequent days
-        cum_series = cum_valid.reindex(returns_df.index)
-        cum_series.ffill(inplace=True)
-        # For days before first valid return, set to 1.0 (so series starts at 1.0)
-        first_valid = valid.index[0]
-        cum_series.loc[:first_valid] = 1.0
-        cum_df[name] = cum_series
+    # Log-return frame only when the caller wants it
+    returns_df = None
+    if return_returns:
+        returns_df = pd.DataFrame(log_arr, index=dates, columns=['full_log', 'intraday_log', 'overnight_log'])
 
     return display_df, numeric_df, returns_df, cum_df
 
 
-def plot_cumulative(cum_df: pd.DataFrame, symbol: str, show_diff: bool = True):
-    """Plot cumulative $1 growth for Full, Intraday, Overnight.
-    If show_diff is True, add a second (stacked) chart sharing the x-axis that shows
-    the ratio Overnight / Intraday.
-    The chart title includes the description from `rollover_rules` when available.
+# Set once the plot theme has been applied in this process (it only needs applying once)
+_theme_set = False
+
+
+def set_plot_theme() -> None:
+    """Apply the seaborn 'darkgrid' theme (matplotlib defaults if that fails), once per process.
+    Only affects axes created afterwards.
     """
+    global _theme_set
+    if _theme_set:
+        return
+    _theme_set = True
+
+    # Plotting libraries are imported lazily so that the stats functions can be used without paying for them
+    # Silence verbose font discovery messages from matplotlib
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.WARNING)
+    import seaborn as sns
+
     try:
         sns.set_theme(style="darkgrid")
         logging.debug("Using seaborn theme 'darkgrid' for plotting.")
     except Exception:
         logging.debug("seaborn theme failed; using matplotlib defaults.")
 
-    # Try to fetch description from DB (fallback to symbol)
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("SELECT description FROM rollover_rules WHERE symbol_code = ?", (symbol,))
-        row = cur.fetchone()
-        description = row[0] if row and row[0] else symbol
-        conn.close()
-    except Exception:
-        description = symbol
+
+def plot_cumulative(cum_df: pd.DataFrame, symbol: str, show_diff: bool = True, description: str = None,
+                    ax=None, ax_ratio=None):
+    """Plot cumulative $1 growth for Full, Intraday, Overnight.
+    If show_diff is True, add a second (stacked) chart sharing the x-axis that shows
+    the ratio Overnight / Intraday.
+    The chart title includes `description`, looked up from `rollover_rules` when not passed in.
+    When `ax` (and `ax_ratio` for the ratio chart) are given, plot into those (empty) axes instead of
+    creating a new figure; layout and showing/saving are then left to the caller.
+    """
+    set_plot_theme()
+    import matplotlib.pyplot as plt
+
+    # Fetch description from DB when not given (fallback to symbol)
+    if description is None:
+        description = _descriptions(DB_PATH).get(symbol, symbol)
 
     # Determine which series to plot
     plotted = []
@@ -203,8 +219,11 @@ def plot_cumulative(cum_df: pd.DataFrame, symbol: str, show_diff: bool = True):
         logging.info("No data to plot for %s", symbol)
         return
 
-    # Create either one axes or two stacked axes sharing x-axis
-    if show_diff:
+    # Create either one axes or two stacked axes sharing x-axis (unless the caller supplied them)
+    own_figure = ax is None
+    if not own_figure:
+        fig = ax.figure
+    elif show_diff:
         fig, (ax, ax_ratio) = plt.subplots(nrows=2, sharex=True, figsize=(10, 8),
                                            gridspec_kw={'height_ratios': [3, 1]})
     else:
@@ -221,15 +240,10 @@ def plot_cumulative(cum_df: pd.DataFrame, symbol: str, show_diff: bool = True):
         ax.plot(series.index, series.values, label=col)
 
     # Legend for top plot showing final values (2 decimals)
+    # (cumulative series carry their last value forward, so the final values are just the last row)
     handles, labels = ax.get_legend_handles_labels()
-    new_labels = []
-    for lab in labels:
-        if lab in cum_df.columns:
-            col_series = cum_df[lab].dropna()
-            final_val = col_series.iloc[-1] if not col_series.empty else np.nan
-            new_labels.append(f"{lab} (final={final_val:.2f})" if not np.isnan(final_val) else f"{lab} (final=nan)")
-        else:
-            new_labels.append(lab)
+    final_vals = cum_df.iloc[-1]
+    new_labels = [f"{lab} (final={final_vals[lab]:.2f})" if lab in final_vals.index else lab for lab in labels]
     ax.legend(handles, new_labels, loc='best')
     ax.set_title(f"Cumulative $1 returns - {description} ({symbol})")
     ax.set_ylabel("Value of $1")
@@ -266,8 +280,9 @@ def plot_cumulative(cum_df: pd.DataFrame, symbol: str, show_diff: bool = True):
         ax.set_xlabel("Trade Date")
 
     fig.autofmt_xdate()
-    plt.tight_layout()
-    plt.show()
+    if own_figure:
+        plt.tight_layout()
+        plt.show()
 
 
 def main(argv=None, start_date: str = None, end_date: str = None, show_diff: bool = True) -> int:
@@ -300,14 +315,12 @@ def main(argv=None, start_date: str = None, end_date: str = None, show_diff: boo
     # If either date is still missing, query the DB for min/max trade_date for the symbol
     if effective_start is None or effective_end is None:
         try:
-            conn = sqlite3.connect(args.db)
-            cur = conn.cursor()
+            cur = _get_conn(args.db).cursor()
             cur.execute(
                 "SELECT MIN(trade_date), MAX(trade_date) FROM daily_reference_prices WHERE symbol_code = ?",
                 (args.symbol,),
             )
             row = cur.fetchone()
-            conn.close()
         except Exception:
             logging.exception("Failed to query date range from database")
             return 2
@@ -332,7 +345,8 @@ def main(argv=None, start_date: str = None, end_date: str = None, show_diff: boo
 
     # Plot cumulative returns, passing effective_show_diff
     try:
-        plot_cumulative(cum_df, args.symbol, show_diff=effective_show_diff)
+        plot_cumulative(cum_df, args.symbol, show_diff=effective_show_diff,
+                        description=_descriptions(args.db).get(args.symbol, args.symbol))
     except Exception:
         logging.exception("Plotting failed (continuing)")
 
@@ -5,15 +5,16 @@ Saves symbol description (from rollover_rules) in filenames and dataframe header
 from __future__ import annotations
 
 import argparse
-import contextlib
 import logging
+import os
 import sqlite3
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from typing import List, Tuple
 
 import pandas as pd
-import matplotlib.pyplot as plt
 
 # Ensure project `src` root is on sys.path when executed
 _script_dir = Path(__file__).resolve().parent
@@ -22,7 +23,7 @@ if str(_project_src) not in sys.path:
     sys.path.insert(0, str(_project_src))
 
 from python.config import DB_PATH, RESULTS_FOLDER
-from python.calc_overnight_stats import compute_reference_stats, plot_cumulative
+from python.calc_overnight_stats import compute_all_reference_stats, plot_cumulative, set_plot_theme
 
 RESULTS_FOLDER = Path(RESULTS_FOLDER)
 
@@ -57,23 +58,122 @@ def safe_filename(name: str) -> str:
     return name
 
 
-@contextlib.contextmanager
-def suppress_interactive_plots():
+def _init_worker(log_level: int) -> None:
     """
-    Context manager to prevent interactive plot popups.
-    Temporarily turn interactive mode off and monkeypatch plt.show to no-op.
-    Restores prior state on exit.
+    Process-pool initializer: configure logging in the worker process.
     """
-    prev_interactive = plt.isinteractive()
-    prev_show = plt.show
+    logging.basicConfig(level=log_level, format="%(asctime)s %(levelname)s %(message)s")
+
+
+# (fig, ax, ax_ratio) reused for every symbol plotted by this process; created on first use
+_figure = None
+
+
+def _import_pyplot():
+    """
+    Import and return matplotlib.pyplot (only once there is something to plot). Figures are only ever
+    saved to PNG: the non-interactive backend is selected first (no GUI toolkit init, plt.show is a no-op).
+    """
+    # Silence verbose font discovery messages from matplotlib
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.WARNING)
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _warm_plotting() -> None:
+    """
+    Apply the plot theme and build matplotlib's font cache once in the parent process, before the
+    workers start, instead of every worker scanning fonts on its first plot.
+    """
+    _import_pyplot()
+    set_plot_theme()
     try:
-        plt.ioff()
-        plt.show = lambda *a, **kw: None
-        yield
-    finally:
-        plt.show = prev_show
-        if prev_interactive:
-            plt.ion()
+        from matplotlib import font_manager
+        # resolve the theme's default font family, which loads (or builds) the font cache
+        font_manager.findfont(font_manager.FontProperties(family=["sans-serif"]))
+    except Exception:
+        logging.debug("Font cache warm-up failed (continuing)")
+
+
+def _get_axes():
+    """
+    Return this process's (fig, ax, ax_ratio), creating the figure on the first call and
+    clearing the axes on later calls, so the canvas is allocated once rather than per symbol.
+    """
+    global _figure
+    plt = _import_pyplot()
+
+    if _figure is None:
+        set_plot_theme()  # the theme only applies to axes created after it is set
+        fig, (ax, ax_ratio) = plt.subplots(nrows=2, sharex=True, figsize=(10, 8),
+                                           gridspec_kw={'height_ratios': [3, 1]})
+        _figure = (fig, ax, ax_ratio)
+    else:
+        _figure[1].cla()
+        _figure[2].cla()
+    return _figure
+
+
+def _process_symbol(symbol: str, stats: Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame],
+                    results_dir: Path, dpi: int = 150, show_diff: bool = True) -> bool:
+    """
+    Write `<symbol>_<description>` XLSX + PNG into results_dir from the frames returned by
+    compute_reference_stats (display_df, numeric_df, returns_df, cum_df). Runs in a worker process.
+    Returns False if either file could not be written.
+    """
+    logging.info("Processing %s...", symbol)
+    display_df, numeric_df, returns_df, cum_df = stats
+
+    # Extract top label (format: "<description> (<symbol>) stats")
+    try:
+        top_label = display_df.columns.levels[0][0]
+    except Exception:
+        top_label = f"{symbol}"
+    # Try to extract description portion (split at last " (")
+    description = top_label.rsplit(" (", 1)[0] if " (" in top_label else symbol
+
+    base_name = safe_filename(f"{symbol}_{description}")
+    png_path = results_dir / f"{base_name}.png"
+    xlsx_path = results_dir / f"{base_name}.xlsx"
+
+    # Save numeric_df to excel first. xlsxwriter only writes (no workbook model to build up, unlike openpyxl);
+    # constant_memory mode is not used because pandas emits the body column by column and that mode only
+    # keeps cells written in row order.
+    ok = True
+    try:
+        numeric_df.to_excel(xlsx_path, sheet_name="stats", engine="xlsxwriter")
+        logging.info("Wrote stats XLSX: %s", xlsx_path)
+    except Exception:
+        logging.exception("Failed to write XLSX for %s", symbol)
+        ok = False
+
+    # Plot and save figure (Agg backend: nothing pops up)
+    if cum_df is None or cum_df.empty:
+        logging.info("No cumulative data for %s; skipping plot", symbol)
+        return ok
+
+    try:
+        if show_diff:
+            # plot into this process's reused figure
+            fig, ax, ax_ratio = _get_axes()
+            plot_cumulative(cum_df, symbol, show_diff=True, description=description, ax=ax, ax_ratio=ax_ratio)
+        else:
+            plt = _import_pyplot()
+            # call plotting routine (will create a figure; plt.show is a no-op under Agg)
+            plot_cumulative(cum_df, symbol, show_diff=False, description=description)
+            fig = plt.gcf()
+        # Ensure layout and save
+        fig.tight_layout()
+        fig.savefig(str(png_path), dpi=dpi)
+        if not show_diff:
+            plt.close(fig)
+        logging.info("Saved plot PNG: %s", png_path)
+    except Exception:
+        logging.exception("Failed to save plot for %s", symbol)
+        return False
+    return ok
 
 
 def main(argv=None):
@@ -81,11 +181,14 @@ def main(argv=None):
     parser.add_argument("--db", default=DB_PATH, help="path to sqlite database file")
     parser.add_argument("--min-rows", type=int, default=1000, help="minimum number of rows in daily_reference_prices to include symbol")
     parser.add_argument("--results-dir", default=str(RESULTS_FOLDER), help="directory to write results into")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: CPU count; 1 runs in-process)")
+    parser.add_argument("--dpi", type=int, default=150, help="resolution of the saved PNGs (default: 150)")
     parser.add_argument("-v", "--verbose", action="store_true", help="enable debug logging")
     args = parser.parse_args(argv)
 
-    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
-                        format="%(asctime)s %(levelname)s %(message)s")
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=log_level, format="%(asctime)s %(levelname)s %(message)s")
 
     results_dir = Path(args.results_dir)
     results_dir.mkdir(parents=True, exist_ok=True)
@@ -93,72 +196,37 @@ def main(argv=None):
 
     conn = sqlite3.connect(args.db)
     try:
-        cur = conn.cursor()
-        candidates = fetch_candidates(cur, args.min_rows)
+        candidates = fetch_candidates(conn.cursor(), args.min_rows)
         logging.info("Found %d candidate symbols (min_rows=%d)", len(candidates), args.min_rows)
 
-        for symbol, cnt in candidates:
-            logging.info("Processing %s (%d rows)...", symbol, cnt)
-            # Determine date range for this symbol
-            cur.execute(
-                "SELECT MIN(trade_date), MAX(trade_date) FROM daily_reference_prices WHERE symbol_code = ?",
-                (symbol,),
-            )
-            row = cur.fetchone()
-            if not row or row[0] is None or row[1] is None:
-                logging.warning("No dates for %s; skipping", symbol)
-                continue
-            start_date, end_date = row[0], row[1]
-
-            try:
-                display_df, numeric_df, returns_df, cum_df = compute_reference_stats(args.db, symbol, start_date, end_date)
-            except Exception:
-                logging.exception("Failed to compute stats for %s; skipping", symbol)
-                continue
-
-            # Extract top label (format: "<description> (<symbol>) stats")
-            try:
-                top_label = display_df.columns.levels[0][0]
-            except Exception:
-                top_label = f"{symbol}"
-            # Try to extract description portion (split at last " (")
-            description = top_label.rsplit(" (", 1)[0] if " (" in top_label else symbol
-
-            base_name = safe_filename(f"{symbol}_{description}")
-            png_path = results_dir / f"{base_name}.png"
-            xlsx_path = results_dir / f"{base_name}.xlsx"
-
-            # Save numeric_df to excel first
-            try:
-                numeric_df.to_excel(xlsx_path, sheet_name="stats")
-                logging.info("Wrote stats XLSX: %s", xlsx_path)
-            except Exception:
-                logging.exception("Failed to write XLSX for %s", symbol)
-
-            # Plot and save figure without popping up windows
-            if cum_df is None or cum_df.empty:
-                logging.info("No cumulative data for %s; skipping plot", symbol)
-                continue
-
-            try:
-                with suppress_interactive_plots():
-                    # call plotting routine (will create a figure but not show it)
-                    plot_cumulative(cum_df, symbol, show_diff=True)
-                    # capture the current figure and save it
-                    fig = plt.gcf()
-                    # Ensure layout and save
-                    fig.tight_layout()
-                    fig.savefig(str(png_path), dpi=150)
-                    plt.close(fig)
-                logging.info("Saved plot PNG: %s", png_path)
-            except Exception:
-                logging.exception("Failed to save plot for %s", symbol)
+        # One query for all candidates; each symbol is computed over its full date range
+        try:
+            all_stats = compute_all_reference_stats(args.db, [symbol for symbol, _ in candidates], conn=conn)
+        except Exception:
+            logging.exception("Failed to compute stats")
+            return 2
     finally:
         conn.close()
-
-    logging.info("All done.")
+    for symbol, _ in candidates:
+        if symbol not in all_stats:
+            logging.warning("No stats for %s; skipping", symbol)
+    symbols = list(all_stats)
+    stats = [all_stats[symbol] for symbol in symbols]
+
+    if symbols:
+        _warm_plotting()
+
+    # Symbols are independent (separate output files), so fan the XLSX/PNG writing out across processes.
+    if args.workers is None or args.workers <= 1 or len(symbols) <= 1:
+        done = [_process_symbol(symbol, st, results_dir, args.dpi) for symbol, st in zip(symbols, stats)]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(log_level,)) as executor:
+            done = list(executor.map(_process_symbol, symbols, stats, repeat(results_dir), repeat(args.dpi)))
+
+    logging.info("All done (%d/%d symbols written).", sum(done), len(candidates))
     return 0
 
 
 if __name__ == "__main__":
-    raise SystemExit(main())
\ No newline at end of file
+    raise SystemExit(main())
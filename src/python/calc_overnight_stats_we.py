@@ -3,7 +3,6 @@ import sqlite3
 import argparse
 import logging
 from pathlib import Path
-from math import sqrt
 from typing import Tuple
 
 import numpy as np
@@ -16,8 +15,7 @@ if str(_project_src) not in sys.path:
     sys.path.insert(0, str(_project_src))
 
 from python.config import DB_PATH
-
-TRADING_DAYS = 252
+from python._stats_core import STAT_ROWS, format_stats, log_returns, log_table_stats
 
 
 def compute_reference_stats(db_path: str, symbol: str, start_date: str, end_date: str) -> Tuple[
@@ -35,6 +33,9 @@ def compute_reference_stats(db_path: str, symbol: str, start_date: str, end_date
     being the immediate next weekday (Mon->Tue, Tue->Wed, Wed->Thu, Thu->Fri).
     """
     conn = sqlite3.connect(db_path)
+    # Read-side tuning for this connection: memory-mapped I/O and a larger page cache
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-200000")
     sql = """
         SELECT trade_date, price_open, price_close, prev_close
         FROM daily_reference_prices
@@ -42,7 +43,12 @@ def compute_reference_stats(db_path: str, symbol: str, start_date: str, end_date
           AND trade_date BETWEEN ? AND ?
         ORDER BY trade_date
     """
-    df = pd.read_sql_query(sql, conn, params=(symbol, start_date, end_date))
+    # Typed columns straight from the reader: ISO trade dates parsed with a fixed format, prices as float64
+    df = pd.read_sql_query(
+        sql, conn, params=(symbol, start_date, end_date),
+        parse_dates={'trade_date': '%Y-%m-%d'},
+        dtype={'price_open': 'float64', 'price_close': 'float64', 'prev_close': 'float64'},
+    )
 
     # Fetch description from rollover_rules (fallback to symbol if missing)
     try:
@@ -55,114 +61,49 @@ def compute_reference_stats(db_path: str, symbol: str, start_date: str, end_date
 
     conn.close()
 
-    # Ensure trade_date is datetime and sorted
-    df['trade_date'] = pd.to_datetime(df['trade_date'])
-    df = df.sort_values('trade_date').reset_index(drop=True)
-
-    # Compute previous trading day's date (from the ordered rows)
-    df['prev_trade_date'] = df['trade_date'].shift(1)
-
-    # intraday: ln(close / open) only when prev_close exists (per requirement)
-    df['intraday_log'] = np.where(
-        (df['price_open'].notna()) &
-        (df['price_close'].notna()) &
-        (df['price_open'] != 0) &
-        (df['prev_close'].notna()),
-        np.log(df['price_close'] / df['price_open']),
-        np.nan
-    )
-
-    # overnight: ln(open / prev_close) for all rows where prev_close exists
-    df['overnight_log'] = np.where(
-        (df['price_open'].notna()) & (df['prev_close'].notna()) & (df['prev_close'] != 0),
-        np.log(df['price_open'] / df['prev_close']),
-        np.nan
-    )
+    # (rows arrive ordered by trade_date from the query)
 
-    # full = intraday + overnight
-    df['full_log'] = df['intraday_log'] + df['overnight_log']
+    # Plain float arrays (NULL -> NaN, also when a whole column is NULL)
+    intraday, overnight = log_returns(df['price_open'].to_numpy(dtype=np.float64),
+                                      df['price_close'].to_numpy(dtype=np.float64),
+                                      df['prev_close'].to_numpy(dtype=np.float64))
 
-    # Determine day-of-week for current and previous trade dates
-    # Monday=0, Tuesday=1, ..., Friday=4
-    prev_day = df['prev_trade_date'].dt.dayofweek
-    curr_day = df['trade_date'].dt.dayofweek
+    # Determine day-of-week (int8) for current and previous trade dates (previous = prior row)
+    # Monday=0, Tuesday=1, ..., Friday=4; the first row has no previous trading day (7 matches neither mask)
+    curr_day = df['trade_date'].dt.dayofweek.to_numpy().astype(np.int8)
+    prev_day = np.empty_like(curr_day)
+    prev_day[:1] = 7
+    prev_day[1:] = curr_day[:-1]
 
     # Weekend overnight: prev was Friday (4) and current is Monday (0)
     weekend_mask = (prev_day == 4) & (curr_day == 0)
 
     # Business overnight: prev is Mon-Thu (0..3) and current is prev + 1 (i.e. immediate next weekday)
-    business_mask = prev_day.isin([0, 1, 2, 3]) & (curr_day == prev_day + 1)
-
-    # Create separate overnight series
-    df['overnight_weekend_log'] = np.where(weekend_mask, df['overnight_log'], np.nan)
-    df['overnight_business_log'] = np.where(business_mask, df['overnight_log'], np.nan)
-
-    # Helper to compute stats from a log-return series
-    def stats_from_log_series(log_series: pd.Series) -> Tuple[float, float, float, float, float]:
-        """Return (final_value, daily_mean_pct, annual_mean_pct, annual_std_pct, ann_sharpe_decimal)."""
-        s = log_series.dropna()
-        n = len(s)
-        if n == 0:
-            return (np.nan, np.nan, np.nan, np.nan, np.nan)
-
-        simple = np.exp(s.values) - 1.0
-        final_value = float(np.prod(1.0 + simple))
-        daily_mean_pct = float(np.nanmean(simple)) * 100.0
-
-        if final_value <= 0:
-            annual_mean_pct = np.nan
-            annual_mean_decimal = np.nan
-        else:
-            annual_mean_decimal = final_value ** (TRADING_DAYS / n) - 1.0
-            annual_mean_pct = float(annual_mean_decimal * 100.0)
-
-        ddof = 1 if n > 1 else 0
-        daily_std = float(np.std(simple, ddof=ddof))
-        annual_std_decimal = daily_std * sqrt(TRADING_DAYS)
-        annual_std_pct = annual_std_decimal * 100.0
-
-        # Sharpe (risk-free = 0) -> decimal (not percent)
-        if annual_std_decimal == 0 or np.isnan(annual_mean_decimal):
-            ann_sharpe = np.nan
-        else:
-            ann_sharpe = annual_mean_decimal / annual_std_decimal
-
-        return (final_value, daily_mean_pct, annual_mean_pct, annual_std_pct, ann_sharpe)
-
-    # Compute stats for each series
-    full_stats = stats_from_log_series(df['full_log'])
-    intraday_stats = stats_from_log_series(df['intraday_log'])
-    overnight_all_stats = stats_from_log_series(df['overnight_log'])
-    overnight_business_stats = stats_from_log_series(df['overnight_business_log'])
-    overnight_weekend_stats = stats_from_log_series(df['overnight_weekend_log'])
+    business_mask = (prev_day <= 3) & (curr_day == prev_day + 1)
 
-    rows = [
-        'Final value of $1',
-        'Daily Mean Ret (%)',
-        'Annual Mean Ret (%)',
-        'Annual StdDev(%)',
-        'Ann Sharpe Ratio'  # decimal, not percent
+    # Stats for all five series at once: columns of a (n_days, 5) log-return table, NaN = no return that day
+    series = [
+        ('full_log', 'Full'),
+        ('intraday_log', 'Intraday'),
+        ('overnight_log', 'Overnight (all)'),
+        ('overnight_business_log', 'Overnight (business)'),
+        ('overnight_weekend_log', 'Overnight (weekend)')
     ]
-
-    numeric_df = pd.DataFrame(
-        data={
-            'Full': full_stats,
-            'Intraday': intraday_stats,
-            'Overnight (all)': overnight_all_stats,
-            'Overnight (business)': overnight_business_stats,
-            'Overnight (weekend)': overnight_weekend_stats
-        },
-        index=rows
-    )
+    log_arr = np.column_stack([
+        intraday + overnight,  # full = intraday + overnight
+        intraday,
+        overnight,
+        np.where(business_mask, overnight, np.nan),
+        np.where(weekend_mask, overnight, np.nan),
+    ])
+    df[[col for col, _ in series]] = log_arr
+    # Stats and cumulative $1 series of every column in a single compiled pass
+    stats, cum = log_table_stats(log_arr)
+
+    numeric_df = pd.DataFrame(stats, index=STAT_ROWS, columns=[name for _, name in series])
 
     # Format for display (3 decimals). Keep numeric_df separate for programmatic use.
-    def fmt_cell(x):
-        if x is None or (isinstance(x, float) and np.isnan(x)):
-            return "nan"
-        return f"{x:.3f}"
-
-    display_df = numeric_df.copy()
-    display_df = display_df.stack().map(fmt_cell).unstack()
+    display_df = format_stats(numeric_df)
 
     # Put top-level label "<description> (<symbol>) stats" above the columns (MultiIndex)
     top_label = f"{description} ({symbol}) stats"
@@ -174,28 +115,7 @@ def compute_reference_stats(db_path: str, symbol: str, start_date: str, end_date
                      'overnight_business_log', 'overnight_weekend_log']].copy()
     returns_df = returns_df.set_index('trade_date')
 
-    # Compute cumulative $1 series for each return type
-    cum_df = pd.DataFrame(index=returns_df.index)
-    col_map = [
-        ('full_log', 'Full'),
-        ('intraday_log', 'Intraday'),
-        ('overnight_log', 'Overnight (all)'),
-        ('overnight_business_log', 'Overnight (business)'),
-        ('overnight_weekend_log', 'Overnight (weekend)')
-    ]
-    for col, name in col_map:
-        s = returns_df[col]
-        valid = s.dropna()
-        if valid.empty:
-            cum_df[name] = np.nan
-            continue
-
-        cum_valid = np.exp(valid.cumsum())
-        cum_series = cum_valid.reindex(returns_df.index)
-        cum_series.ffill(inplace=True)
-        first_valid = valid.index[0]
-        cum_series.loc[:first_valid] = 1.0
-        cum_df[name] = cum_series
+    cum_df = pd.DataFrame(cum, index=returns_df.index, columns=[name for _, name in series])
 
     return display_df, numeric_df, returns_df, cum_df
 
@@ -3,7 +3,9 @@ results in the liquid_contract_daily table.
 
 This revision only considers trade dates where there is at least one bar
 between REQUIRED_OPEN_START and REQUIRED_OPEN_END (to exclude weekends/holidays
-or days where the market only opens in the evening).
+or days where the market only opens in the evening). The window check looks at
+the bars of the contracts inside the MAX_DAYS_TO_LAST_DAY expiry window, which
+are the only bars read.
 """
 from __future__ import annotations
 
@@ -12,7 +14,7 @@ import logging
 import sqlite3
 import sys
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 # Ensure project `src` root is on sys.path when this file is executed as a script.
 _script_dir = Path(__file__).resolve().parent
@@ -29,97 +31,205 @@ from python.config import (
 )
 
 
-def compute_liquid_contracts(conn: sqlite3.Connection, symbol_code: str, dry_run: bool = False) -> None:
+def ensure_contracts_index(conn: sqlite3.Connection) -> None:
     """
-    For the given symbol_code, identify the most liquid contract per trade_date T
-    where:
-      - contract's daily volume for T >= MIN_DAILY_VOLUME
-      - contract.last_trade_date is not NULL and (last_trade_date - T) between 0 and MAX_DAYS_TO_LAST_DAY
-      - trade_date has at least one bar with time between REQUIRED_OPEN_START and REQUIRED_OPEN_END
-
-    Results are upserted into liquid_contract_daily (symbol_code, trade_date, contract_id).
+    Create the (symbol_code, last_trade_date) index on contracts if it is missing, so the per-symbol
+    contract lookup does not scan the table. Best effort: a read-only DB is left untouched.
+    (bars_5min needs no extra index: its primary key (contract_id, timestamp) serves the range reads.)
     """
-    cur = conn.cursor()
-
-    sql = f"""
-    WITH allowed_dates AS (
-        -- days where the symbol has at least one bar in the required open window
-        SELECT DISTINCT date(b.timestamp) AS trade_date
-        FROM bars_5min b
-        JOIN contracts c ON c.contract_id = b.contract_id
-        WHERE c.symbol_code = ?
-          AND time(b.timestamp) BETWEEN ? AND ?
-    ),
-    daily AS (
+    try:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_contracts_sym_last ON contracts(symbol_code, last_trade_date)")
+        conn.commit()
+    except sqlite3.Error as exc:
+        logging.debug("Could not create idx_contracts_sym_last: %s", exc)
+
+
+# Most liquid contract per (symbol, trade_date). Single scan of bars_5min: each contract's bars are read as one
+# primary-key range [last_trade_date - MAX_DAYS_TO_LAST_DAY, last_trade_date] (timestamps are ISO text, so a
+# bare date compares as that day's midnight), and the per-day open-window flag is computed in the same pass.
+# The day is the 'YYYY-MM-DD' prefix of the timestamp.
+# {symbol_filter} is either empty (all symbols) or a `c.symbol_code = ?` predicate.
+_WINNERS_SQL = """
+    WITH daily AS (
         SELECT
-            date(b.timestamp) AS trade_date,
+            c.symbol_code,
+            substr(b.timestamp, 1, 10) AS trade_date,
             b.contract_id,
-            SUM(COALESCE(b.volume, 0)) AS vol_sum
-        FROM bars_5min b
-        JOIN contracts c ON c.contract_id = b.contract_id
-        WHERE c.symbol_code = ?
-          AND c.last_trade_date IS NOT NULL
-          -- ensure contract still has <= MAX_DAYS_TO_LAST_DAY days left at date(b.timestamp)
-          AND julianday(c.last_trade_date) - julianday(date(b.timestamp)) BETWEEN 0 AND ?
-          -- only consider trade_dates that are in the allowed open-time window
-          AND date(b.timestamp) IN (SELECT trade_date FROM allowed_dates)
-        GROUP BY date(b.timestamp), b.contract_id
-        HAVING vol_sum >= ?
+            SUM(COALESCE(b.volume, 0)) AS vol_sum,
+            MAX(time(b.timestamp) BETWEEN ? AND ?) AS in_window
+        FROM contracts c
+        JOIN bars_5min b ON b.contract_id = c.contract_id
+        WHERE c.last_trade_date IS NOT NULL
+          {symbol_filter}
+          -- ensure contract still has <= MAX_DAYS_TO_LAST_DAY days left at the bar's trade date
+          AND b.timestamp >= date(c.last_trade_date, ?)
+          AND b.timestamp < date(c.last_trade_date, '+1 day')
+        GROUP BY c.symbol_code, substr(b.timestamp, 1, 10), b.contract_id
     ),
     ranked AS (
         SELECT
+            symbol_code,
             trade_date,
             contract_id,
+            vol_sum,
+            -- only consider trade_dates that have a bar in the allowed open-time window
+            MAX(in_window) OVER (PARTITION BY symbol_code, trade_date) AS day_open,
             ROW_NUMBER() OVER (
-                PARTITION BY trade_date
+                PARTITION BY symbol_code, trade_date
                 ORDER BY vol_sum DESC, contract_id
             ) AS rn
         FROM daily
     )
-    SELECT trade_date, contract_id
+    SELECT symbol_code, trade_date, contract_id
     FROM ranked
     WHERE rn = 1
-    ORDER BY trade_date;
+      AND day_open = 1
+      AND vol_sum >= ?
+    ORDER BY symbol_code, trade_date;
+"""
+# Formatted once, so every call passes the identical string and hits the connection's statement cache
+_WINNERS_ALL_SQL = _WINNERS_SQL.format(symbol_filter="")
+_WINNERS_SYMBOL_SQL = _WINNERS_SQL.format(symbol_filter="AND c.symbol_code = ?")
+
+_UPSERT_WINNERS_SQL = """
+    INSERT OR REPLACE INTO liquid_contract_daily (symbol_code, trade_date, contract_id)
+    VALUES (?, ?, ?)
+"""
+
+
+def _select_winners(conn: sqlite3.Connection, symbol_code: Optional[str] = None) -> Iterator[Tuple[str, str, int]]:
+    """
+    Iterate the (symbol_code, trade_date, contract_id) winners for one symbol, or for all symbols if symbol_code
+    is None, from a single query. Rows are streamed from the cursor, not fetched into a list.
     """
+    if symbol_code is None:
+        sql = _WINNERS_ALL_SQL
+        symbol_params = ()
+    else:
+        sql = _WINNERS_SYMBOL_SQL
+        symbol_params = (symbol_code,)
 
     params = (
-        symbol_code,                # allowed_dates: symbol
-        REQUIRED_OPEN_START,        # allowed_dates: start time
-        REQUIRED_OPEN_END,          # allowed_dates: end time
-        symbol_code,                # daily: symbol
-        MAX_DAYS_TO_LAST_DAY,       # daily: max days window
-        MIN_DAILY_VOLUME,           # daily: minimum daily volume (HAVING)
+        REQUIRED_OPEN_START,                # daily: open window start time
+        REQUIRED_OPEN_END,                  # daily: open window end time
+        *symbol_params,                     # daily: symbol (if any)
+        f"-{MAX_DAYS_TO_LAST_DAY} days",    # daily: max days window (date modifier)
+        MIN_DAILY_VOLUME,                   # ranked: minimum daily volume of the winner
+    )
+    return conn.cursor().execute(sql, params)
+
+
+# Bars inside each contract's expiry window, for the Polars engine (same range predicate as _WINNERS_SQL)
+_WINDOW_BARS_SQL = """
+    SELECT c.symbol_code, b.contract_id, b.timestamp, b.volume
+    FROM contracts c
+    JOIN bars_5min b ON b.contract_id = c.contract_id
+    WHERE c.last_trade_date IS NOT NULL
+      AND b.timestamp >= date(c.last_trade_date, ?)
+      AND b.timestamp < date(c.last_trade_date, '+1 day')
+"""
+
+
+def _select_winners_polars(conn: sqlite3.Connection) -> List[Tuple[str, str, int]]:
+    """
+    Same result as _select_winners(conn) for all symbols, with the daily aggregation and ranking done by a
+    Polars LazyFrame (parallel group-by, streaming collect) instead of SQLite window functions.
+    Polars is optional and only imported here.
+    """
+    import polars as pl
+
+    bars = pl.read_database(
+        _WINDOW_BARS_SQL, conn,
+        execute_options={"parameters": (f"-{MAX_DAYS_TO_LAST_DAY} days",)},
+        schema_overrides={"symbol_code": pl.String, "contract_id": pl.Int64, "timestamp": pl.String,
+                          "volume": pl.Int64},
     )
+    winners = (
+        bars.lazy()
+        .with_columns(
+            trade_date=pl.col("timestamp").str.slice(0, 10),
+            # 'HH:MM:SS' like SQLite time(), so the window bounds compare the same way as in _WINNERS_SQL
+            in_window=pl.concat_str(pl.col("timestamp").str.slice(11, 5), pl.lit(":00"))
+            .is_between(pl.lit(REQUIRED_OPEN_START), pl.lit(REQUIRED_OPEN_END)),
+        )
+        .group_by("symbol_code", "trade_date", "contract_id")
+        .agg(vol_sum=pl.col("volume").fill_null(0).sum(), in_window=pl.col("in_window").any())
+        # only consider trade_dates that have a bar in the allowed open-time window
+        .with_columns(day_open=pl.col("in_window").any().over("symbol_code", "trade_date"))
+        .sort(["vol_sum", "contract_id"], descending=[True, False])
+        .group_by("symbol_code", "trade_date", maintain_order=True)
+        .first()
+        .filter(pl.col("day_open") & (pl.col("vol_sum") >= MIN_DAILY_VOLUME))
+        .sort("symbol_code", "trade_date")
+        .select("symbol_code", "trade_date", "contract_id")
+        .collect(engine="streaming")
+    )
+    return winners.rows()
 
-    cur.execute(sql, params)
-    winners: List[Tuple[str, int]] = cur.fetchall()  # (trade_date, contract_id)
 
-    if not winners:
+def _store_winners(conn: sqlite3.Connection, rows: Iterable[Tuple[str, str, int]], label: str,
+                   dry_run: bool = False) -> int:
+    """
+    Upsert (symbol_code, trade_date, contract_id) rows into liquid_contract_daily with one executemany.
+    rows may be a live cursor on the same connection: the upsert runs on its own cursor and the rows are streamed
+    into it. Returns the number of rows.
+    """
+    if dry_run:
+        count = sum(1 for _ in rows)
+    else:
+        cur = conn.cursor()
+        cur.executemany(_UPSERT_WINNERS_SQL, rows)
+        count = cur.rowcount
+
+    if not count:
         logging.info(
             "No winners for %s after applying filters (MIN_DAILY_VOLUME=%d, MAX_DAYS_TO_LAST_DAY=%d, required open %s-%s).",
-            symbol_code,
+            label,
             MIN_DAILY_VOLUME,
             MAX_DAYS_TO_LAST_DAY,
             REQUIRED_OPEN_START,
             REQUIRED_OPEN_END,
         )
-        return
+    elif dry_run:
+        logging.info("Dry run: would upsert %d rows into liquid_contract_daily for %s.", count, label)
+    else:
+        logging.info("Inserted/updated %d rows into liquid_contract_daily for %s.", count, label)
 
-    rows = [(symbol_code, trade_date, contract_id) for trade_date, contract_id in winners]
+    if not dry_run:
+        conn.commit()
+    return count
 
-    if dry_run:
-        logging.info("Dry run: would upsert %d rows into liquid_contract_daily for %s.", len(rows), symbol_code)
-        return
-
-    cur.executemany(
-        """
-        INSERT OR REPLACE INTO liquid_contract_daily (symbol_code, trade_date, contract_id)
-        VALUES (?, ?, ?)
-        """,
-        rows,
-    )
-    conn.commit()
-    logging.info("Inserted/updated %d rows into liquid_contract_daily for %s.", len(rows), symbol_code)
+
+def compute_liquid_contracts(conn: sqlite3.Connection, symbol_code: str, dry_run: bool = False) -> None:
+    """
+    For the given symbol_code, identify the most liquid contract per trade_date T
+    where:
+      - contract's daily volume for T >= MIN_DAILY_VOLUME
+      - contract.last_trade_date is not NULL and (last_trade_date - T) between 0 and MAX_DAYS_TO_LAST_DAY
+      - trade_date has at least one bar with time between REQUIRED_OPEN_START and REQUIRED_OPEN_END
+        (among the contracts passing the expiry window check)
+
+    Results are upserted into liquid_contract_daily (symbol_code, trade_date, contract_id).
+    """
+    _store_winners(conn, _select_winners(conn, symbol_code), symbol_code, dry_run=dry_run)
+
+
+def compute_liquid_contracts_all(conn: sqlite3.Connection, dry_run: bool = False, engine: str = "sqlite") -> None:
+    """
+    Same as compute_liquid_contracts for every symbol at once: one query partitioned by symbol_code
+    and one batched upsert, instead of a query per symbol.
+    engine="polars" ranks the contracts with Polars instead of SQLite (same result; needs polars installed).
+    """
+    rows = _select_winners_polars(conn) if engine == "polars" else _select_winners(conn)
+    symbols = set()
+
+    def track_symbols(rows):
+        for row in rows:
+            symbols.add(row[0])
+            yield row
+
+    _store_winners(conn, track_symbols(rows), "all symbols", dry_run=dry_run)
+    logging.info("Found winners for %d symbols.", len(symbols))
 
 
 def main(argv=None):
@@ -134,6 +244,8 @@ def main(argv=None):
 
     conn = sqlite3.connect(args.db)
     try:
+        if not args.dry_run:
+            ensure_contracts_index(conn)
         compute_liquid_contracts(conn, args.symbol, dry_run=args.dry_run)
     finally:
         conn.close()
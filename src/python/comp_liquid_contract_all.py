@@ -1,8 +1,9 @@
 # python
 """Compute daily liquid contracts for all symbols.
 
-This script calls compute_liquid_contracts(conn, symbol_code, dry_run)
-for every symbol in the `symbols` table.
+This script calls compute_liquid_contracts_all(conn, dry_run, engine), which selects
+the winners for every symbol in the `symbols` table with a single query
+(ranked in SQLite, or in Polars with --engine polars).
 """
 from __future__ import annotations
 
@@ -20,7 +21,7 @@ if str(_project_src) not in sys.path:
     sys.path.insert(0, str(_project_src))
 
 from python.config import DB_PATH
-from python.comp_liquid_contract import compute_liquid_contracts
+from python.comp_liquid_contract import compute_liquid_contracts_all, ensure_contracts_index
 
 
 def all_symbols(conn: sqlite3.Connection) -> List[str]:
@@ -32,6 +33,8 @@ def all_symbols(conn: sqlite3.Connection) -> List[str]:
 def main(argv=None):
     parser = argparse.ArgumentParser(description="Compute daily liquid contracts for all symbols")
     parser.add_argument("--db", default=DB_PATH, help="path to sqlite database file")
+    parser.add_argument("--engine", choices=("sqlite", "polars"), default="sqlite",
+                        help="where to rank the contracts: SQLite window functions or Polars (optional dependency)")
     parser.add_argument("--dry-run", action="store_true", help="compute but do not modify the database")
     parser.add_argument("-v", "--verbose", action="store_true", help="enable debug logging")
     args = parser.parse_args(argv)
@@ -41,18 +44,19 @@ def main(argv=None):
 
     conn = sqlite3.connect(args.db)
     try:
+        if not args.dry_run:
+            ensure_contracts_index(conn)
         symbols = all_symbols(conn)
         if not symbols:
             logging.info("No symbols found in the database.")
             return
 
         logging.info("Found %d symbols; processing...", len(symbols))
-        for i, sym in enumerate(symbols, start=1):
-            logging.info("(%d/%d) Processing symbol %s", i, len(symbols), sym)
-            try:
-                compute_liquid_contracts(conn, sym, dry_run=args.dry_run)
-            except Exception:
-                logging.exception("Error processing symbol %s; continuing to next symbol.", sym)
+        try:
+            compute_liquid_contracts_all(conn, dry_run=args.dry_run, engine=args.engine)
+        except Exception:
+            logging.exception("Error computing liquid contracts.")
+            return
         logging.info("Finished processing all symbols.")
     finally:
         conn.close()
@@ -1,9 +1,17 @@
 import argparse
 import logging
+import os
 import sys
 import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from datetime import datetime
+from typing import Dict, List, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pa_csv
 
 # Ensure project `src` root is on sys.path when this file is executed as a script.
 # Place this before any `from python.* import ...` lines in `src/python/load_contracts.py`.
@@ -16,66 +24,128 @@ from python.config import FUTURES_DATA_FOLDER, DB_PATH
 from python.parse_contract_name import parse_contract_filename
 
 
-def ensure_symbol(conn, symbol_code, description=None):
+_ENSURE_SYMBOL_SQL = """
+    INSERT INTO symbols (symbol_code, description)
+    VALUES (?, COALESCE(?, ?))
+    ON CONFLICT(symbol_code) DO NOTHING;
+"""
+
+# Upsert keyed on the filename (not INSERT OR REPLACE, which would delete the row and assign a new contract_id)
+_ENSURE_CONTRACT_SQL = """
+    INSERT INTO contracts (symbol_code, month_code, year, kibot_filename)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(kibot_filename) DO UPDATE SET
+        symbol_code=excluded.symbol_code,
+        month_code=excluded.month_code,
+        year=excluded.year
+"""
+
+
+def ensure_contracts(conn, contracts: List[Tuple[str, str, int, str]]) -> Dict[str, int]:
+    """
+    Insert the symbols and upsert the contracts of (symbol_code, month_code, year, filename) rows:
+    two executemany calls, then one query for the ids. Returns {kibot_filename: contract_id}.
+    """
     cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO symbols (symbol_code, description)
-        VALUES (?, COALESCE(?, ?))
-        ON CONFLICT(symbol_code) DO NOTHING;
-    """, (symbol_code, description, symbol_code))
-    conn.commit()
+    symbols = dict.fromkeys(symbol_code for symbol_code, _, _, _ in contracts)
+    cur.executemany(_ENSURE_SYMBOL_SQL, ((symbol_code, None, symbol_code) for symbol_code in symbols))
+    cur.executemany(_ENSURE_CONTRACT_SQL, contracts)
+    cur.execute("SELECT kibot_filename, contract_id FROM contracts")
+    return dict(cur.fetchall())
 
 
-def ensure_contract(conn, symbol_code, month_code, year, filename):
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO contracts (symbol_code, month_code, year, kibot_filename)
-        VALUES (?, ?, ?, ?)
-        ON CONFLICT(kibot_filename) DO UPDATE SET
-            symbol_code=excluded.symbol_code,
-            month_code=excluded.month_code,
-            year=excluded.year
-        RETURNING contract_id;
-    """, (symbol_code, month_code, year, filename))
-    (contract_id,) = cur.fetchone()
-    return contract_id
-
-
-def load_bars_for_file(conn, filepath: Path, contract_id: int):
+# Column layout of a kibot 5-minute bar file (no header row)
+_BAR_COLUMNS = ["date", "time", "open", "high", "low", "close", "volume"]
+_BAR_TYPES = {"date": pa.string(), "time": pa.string(), "open": pa.float64(), "high": pa.float64(),
+              "low": pa.float64(), "close": pa.float64(), "volume": pa.int64()}
+_BAR_READ_OPTIONS = pa_csv.ReadOptions(column_names=_BAR_COLUMNS)
+_BAR_CONVERT_OPTIONS = pa_csv.ConvertOptions(column_types=_BAR_TYPES)
+
+
+# Parsed bar file as column lists: (timestamp, open, high, low, close, volume)
+BarColumns = Tuple[List[str], List[float], List[float], List[float], List[float], List]
+
+
+def parse_bar_file(filepath: Path) -> BarColumns:
+    """
+    Parse a kibot 5-minute bar file into plain Python column lists ready for executemany.
+    Parsing and the timestamp conversion run in Arrow (C++); needs no DB handle, so it can run in a worker process.
+    """
+    if Path(filepath).stat().st_size == 0:  # the Arrow reader rejects an empty file
+        return [], [], [], [], [], []
+    table = pa_csv.read_csv(filepath, read_options=_BAR_READ_OPTIONS, convert_options=_BAR_CONVERT_OPTIONS)
+
+    # 'MM/DD/YYYY' + 'HH:MM' -> 'YYYY-MM-DD HH:MM' for all rows at once
+    ts = pc.strptime(pc.binary_join_element_wise(table["date"], table["time"], " "),
+                     format="%m/%d/%Y %H:%M", unit="s")
+    ts = pc.strftime(ts, format="%Y-%m-%d %H:%M")  # adjust to UTC later if needed
+    # to_pylist() gives plain Python floats/ints, with missing volume as None (-> NULL)
+    return (ts.to_pylist(), table["open"].to_pylist(), table["high"].to_pylist(), table["low"].to_pylist(),
+            table["close"].to_pylist(), table["volume"].to_pylist())
+
+
+def insert_bars(conn, contract_id: int, columns: BarColumns, commit: bool = True):
     cur = conn.cursor()
-    with filepath.open("r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            date_str, time_str, o, h, l, c, vol = line.split(",")
-            # Parse
-            dt = datetime.strptime(f"{date_str} {time_str}", "%m/%d/%Y %H:%M")
-            ts = dt.strftime("%Y-%m-%d %H:%M")  # adjust to UTC later if needed
+    cur.executemany("""
+        INSERT OR REPLACE INTO bars_5min
+            (contract_id, timestamp, open, high, low, close, volume)
+        VALUES (?, ?, ?, ?, ?, ?, ?);
+    """, zip(repeat(contract_id), *columns))
 
-            volume = int(vol) if vol.strip() != "" else None
+    if commit:
+        conn.commit()
 
-            cur.execute("""
-                INSERT OR REPLACE INTO bars_5min
-                    (contract_id, timestamp, open, high, low, close, volume)
-                VALUES (?, ?, ?, ?, ?, ?, ?);
-            """, (contract_id, ts, float(o), float(h), float(l), float(c), volume))
 
-    conn.commit()
+def load_bars_for_file(conn, filepath: Path, contract_id: int, commit: bool = True):
+    insert_bars(conn, contract_id, parse_bar_file(filepath), commit=commit)
 
 
-def load_all(root_dir, db_path):
+def load_all(root_dir, db_path, workers: int = 1):
+    """
+    Load every contract file under root_dir. With workers > 1 the files are parsed in a process pool
+    while this process stays the only DB writer (SQLite allows a single writer).
+    All files are written in one transaction, committed once at the end.
+    """
     conn = sqlite3.connect(db_path)
+    # Bulk-load settings: WAL + NORMAL sync (fewer fsyncs per commit), temp data in memory, ~200 MB page cache
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-200000")
+
+    files = []
     for path in Path(root_dir).glob("*.txt"):
         parsed = parse_contract_filename(path.name)
         if not parsed:
             continue  # skip continuous
-        symbol_code, month_code, year = parsed
-        ensure_symbol(conn, symbol_code)
-        contract_id = ensure_contract(conn, symbol_code, month_code, year, path.name)
-        load_bars_for_file(conn, path, contract_id)
-        logging.info("Successfully uploaded file: %s", path.name)  # Log progress
-    conn.close()
+        files.append((path, parsed))
+
+    try:
+        # Register all symbols/contracts up front (ids assigned in file order)
+        contract_ids = ensure_contracts(conn, [(*parsed, path.name) for path, parsed in files])
+
+        def store(path, columns):
+            insert_bars(conn, contract_ids[path.name], columns, commit=False)
+            logging.info("Successfully uploaded file: %s", path.name)  # Log progress
+
+        if workers <= 1 or len(files) <= 1:
+            for path, _ in files:
+                store(path, parse_bar_file(path))
+        else:
+            # Keep a bounded number of files in flight so parsed data does not pile up if writing is slower
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                pending = deque()
+                for path, _ in files:
+                    pending.append((path, executor.submit(parse_bar_file, path)))
+                    if len(pending) >= 2 * workers:
+                        path_done, future = pending.popleft()
+                        store(path_done, future.result())
+                while pending:
+                    path_done, future = pending.popleft()
+                    store(path_done, future.result())
+        conn.commit()
+    finally:
+        conn.close()
 
 
 def main(argv=None):
@@ -90,6 +160,8 @@ def main(argv=None):
         default=DB_PATH,
         help="SQLite database path (default: value from config)."
     )
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Number of processes parsing files (default: CPU count; 1 parses in-process).")
     parser.add_argument("--dry-run", action="store_true", help="List files but do not modify the database.")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging.")
     args = parser.parse_args(argv)
@@ -111,7 +183,7 @@ def main(argv=None):
         return
 
     logging.info("Starting load from `%s` into `%s`", root, args.db_path)
-    load_all(root, args.db_path)
+    load_all(root, args.db_path, workers=args.workers or 1)
     logging.info("Finished loading.")
 
 
@@ -17,7 +17,7 @@ Notes for readers unfamiliar with Kibot data:
     price_open  = price at 09:30 on trade_date (bar open or nearest bar <= 09:30)
     price_close = price at 16:00 on trade_date (taken as the last bar *strictly before* 16:00)
     prev_close  = price at 16:00 on the previous trade date (same contract), also strictly before 16:00
-- `inclusive=False` is used when fetching closes to avoid selecting a bar that starts at 16:00
+- closes are taken strictly before 16:00, to avoid selecting a bar that starts at 16:00
   (which would give the 16:05 price instead of the 16:00 market close).
 """
 
@@ -38,96 +38,75 @@ if str(_project_src) not in sys.path:
 
 from python.config import DB_PATH
 
-ALLOWED_FIELDS = {"open", "high", "low", "close"}
-
-
-def get_price_at(cur: sqlite3.Cursor, contract_id: int, date: str, time: str, inclusive: bool = True) -> Optional[
-    float]:
-    """
-    Fetch the most-recent bar (for contract_id) on date at or before (inclusive=True) or
-    strictly before (inclusive=False) the given time. Match hour:minute using strftime to avoid
-    mismatches due to seconds or different timestamp formats.
-    """
-    comparator = "<=" if inclusive else "<"
-    sql = f"""
-        SELECT close
-        FROM bars_5min
-        WHERE contract_id = ?
-          AND date(timestamp) = ?
-          AND strftime('%H:%M', timestamp) {comparator} ?
-        ORDER BY timestamp DESC
-        LIMIT 1
-        """
-    cur.execute(sql, (contract_id, date, time))
-    row = cur.fetchone()
-    return row[0] if row else None
-
-
-def get_exact_field(cur: sqlite3.Cursor, contract_id: int, date: str, time: str, field: str) -> Optional[float]:
-    """Return `field` value from the bar that starts exactly at `time` on `date`, or None.
-    Use strftime('%H:%M', timestamp) to ensure we match hour:minute exactly.
-    """
-    if field not in ALLOWED_FIELDS:
-        raise ValueError("invalid field")
-    sql = f"""
-        SELECT {field}
-        FROM bars_5min
-        WHERE contract_id = ?
-          AND date(timestamp) = ?
-          AND strftime('%H:%M', timestamp) = ?
-        LIMIT 1
-    """
-    cur.execute(sql, (contract_id, date, time))
-    row = cur.fetchone()
-    return row[0] if row else None
-
-
-def get_last_before(cur: sqlite3.Cursor, contract_id: int, date: str, time: str, field: str) -> Optional[float]:
-    """Return `field` from the last bar strictly before `time` on `date`, or None.
-    Use strftime('%H:%M', timestamp) for consistent comparison.
-    """
-    if field not in ALLOWED_FIELDS:
-        raise ValueError("invalid field")
-    sql = f"""
-        SELECT {field}
-        FROM bars_5min
-        WHERE contract_id = ?
-          AND date(timestamp) = ?
-          AND strftime('%H:%M', timestamp) < ?
-        ORDER BY timestamp DESC
-        LIMIT 1
-    """
-    cur.execute(sql, (contract_id, date, time))
-    row = cur.fetchone()
-    return row[0] if row else None
-
-
-def fetch_trade_dates(cur: sqlite3.Cursor, symbol_code: str) -> List[str]:
-    # Trade dates are taken from the daily liquid contract mapping.
-    cur.execute(
-        """
-        SELECT DISTINCT trade_date
-        FROM liquid_contract_daily
-        WHERE symbol_code = ?
-        ORDER BY trade_date
-        """,
-        (symbol_code,),
+# Reference times ('HH:MM', the bar-start part of bars_5min.timestamp)
+_T_OPEN = "09:30"
+_T_CLOSE = "16:00"
+
+# Reference prices for every trade day of a symbol in one statement. Each price is an index seek on the
+# (contract_id, timestamp) primary key: the day's bars are the range [day, 'day HH:MM'), with no
+# date()/strftime() call on the column. prev_close is the previous trade date's close of the same contract:
+# LAG(price_close) when the previous day used that contract too, so it is not looked up twice; on a roll day
+# the previous row's close belongs to another contract, and it is read for the current contract instead.
+# The reference times are SQL literals fixed at import, so only the symbol is bound per call.
+_BATCH_PRICES_SQL = f"""
+    WITH priced AS MATERIALIZED (  -- not flattened into the window: price_close is computed once per day
+        SELECT
+            t.symbol_code,
+            t.trade_date,
+            t.contract_id,
+            COALESCE(
+                -- prefer the open of the bar starting at 09:30
+                (SELECT b.open FROM bars_5min b
+                 WHERE b.contract_id = t.contract_id AND b.timestamp = t.trade_date || ' {_T_OPEN}'),
+                -- otherwise the close of the last bar strictly before 09:30
+                (SELECT b.close FROM bars_5min b
+                 WHERE b.contract_id = t.contract_id
+                   AND b.timestamp >= t.trade_date AND b.timestamp < t.trade_date || ' {_T_OPEN}'
+                 ORDER BY b.timestamp DESC LIMIT 1)
+            ) AS price_open,
+            -- last bar strictly before 16:00 (a bar starting at 16:00 would give the 16:05 price)
+            (SELECT b.close FROM bars_5min b
+             WHERE b.contract_id = t.contract_id
+               AND b.timestamp >= t.trade_date AND b.timestamp < t.trade_date || ' {_T_CLOSE}'
+             ORDER BY b.timestamp DESC LIMIT 1) AS price_close
+        FROM liquid_contract_daily t
+        WHERE t.symbol_code = ?
+    ),
+    days AS (
+        SELECT p.*,
+               LAG(trade_date) OVER w AS prev_date,
+               LAG(contract_id) OVER w AS prev_contract_id,
+               LAG(price_close) OVER w AS prev_day_close
+        FROM priced p
+        WINDOW w AS (ORDER BY trade_date)
     )
-    return [r[0] for r in cur.fetchall()]
+    SELECT
+        t.symbol_code,
+        t.trade_date,
+        t.price_open,
+        t.price_close,
+        CASE
+            WHEN t.prev_contract_id = t.contract_id THEN t.prev_day_close
+            ELSE (SELECT b.close FROM bars_5min b
+                  WHERE b.contract_id = t.contract_id
+                    AND b.timestamp >= t.prev_date AND b.timestamp < t.prev_date || ' {_T_CLOSE}'
+                  ORDER BY b.timestamp DESC LIMIT 1)
+        END AS prev_close
+    FROM days t
+    ORDER BY t.trade_date
+"""
 
+# Same computation written straight into the table: no rows cross into Python
+_INSERT_PRICES_SQL = """
+    INSERT OR REPLACE INTO daily_reference_prices
+        (symbol_code, trade_date, price_open, price_close, prev_close)
+""" + _BATCH_PRICES_SQL
 
-def fetch_contract_for_date(cur: sqlite3.Cursor, symbol_code: str, trade_date: str) -> Optional[int]:
-    # Which contract was considered the liquid contract on `trade_date`.
-    cur.execute(
-        """
-        SELECT contract_id
-        FROM liquid_contract_daily
-        WHERE symbol_code = ? AND trade_date = ?
-        """,
-        (symbol_code, trade_date),
-    )
-    row = cur.fetchone()
-    return row[0] if row else None
+
+def select_reference_prices(conn: sqlite3.Connection, symbol_code: str
+                            ) -> List[Tuple[str, str, Optional[float], Optional[float], Optional[float]]]:
+    """Compute (without writing) the daily_reference_prices rows of `symbol_code`; read-only connections suffice."""
+    return [tuple(r) for r in conn.execute(_BATCH_PRICES_SQL, (symbol_code,))]
 
 
 def upsert_reference_prices(cur: sqlite3.Cursor,
@@ -144,63 +123,80 @@ def upsert_reference_prices(cur: sqlite3.Cursor,
     return len(rows)
 
 
-def process_symbol(conn: sqlite3.Connection, symbol_code: str, dry_run: bool = False) -> int:
+def process_symbol(conn: sqlite3.Connection, symbol_code: str, dry_run: bool = False, commit: bool = True) -> int:
     """
     For each trade date for `symbol_code`:
       - determine the liquid contract_id for that date
       - pick price_open at 09:30 (inclusive: accepts a bar that starts at 09:30)
       - pick price_close at 16:00 (exclusive: picks the previous bar's close)
       - pick prev_close as the prior trade date's 16:00 close (exclusive)
+    All days are computed in SQLite with one statement: INSERT OR REPLACE ... SELECT (_INSERT_PRICES_SQL),
+    or in a dry run the SELECT alone (_BATCH_PRICES_SQL), whose rows are only counted.
+    With commit=False the caller owns the transaction.
     """
-    conn.row_factory = sqlite3.Row
     cur = conn.cursor()
 
-    days = fetch_trade_dates(cur, symbol_code)
-    if not days:
+    if dry_run:
+        count = sum(1 for _ in cur.execute(_BATCH_PRICES_SQL, (symbol_code,)))
+    else:
+        count = cur.execute(_INSERT_PRICES_SQL, (symbol_code,)).rowcount
+    if not count:
         logging.info("No trade days found for symbol %s", symbol_code)
         return 0
 
-    rows: List[Tuple[str, str, Optional[float], Optional[float], Optional[float]]] = []
-
-    for idx, day in enumerate(days):
-        cid = fetch_contract_for_date(cur, symbol_code, day)
-        if cid is None:
-            logging.debug("No liquid contract for %s on %s; skipping", symbol_code, day)
-            continue
-
-        # open: include a bar at 09:30 if present (bar that starts at 09:30 has correct open)
-        # prefer 09:30 bar open; if missing, use the prior bar's close (strictly before 09:30)
-        price_open = get_exact_field(cur, cid, day, "09:30", "open")
-        if price_open is None:
-            price_open = get_last_before(cur, cid, day, "09:30", "close")
-
-        # Can also do this as a simpler solution
-        # price_open = get_price_at(cur, cid, day, "09:30", inclusive=False)
-
-        # close: exclude a bar that starts at 16:00 (select the prior 5-min bar for true 16:00 close)
-        price_close = get_price_at(cur, cid, day, "16:00", inclusive=False)
+    if dry_run:
+        logging.info("Dry run: would insert %d rows for %s", count, symbol_code)
+        return count
 
-        prev_close: Optional[float] = None
-        if idx > 0:
-            prev_day = days[idx - 1]
-            # previous-day close should also be taken from the same contract (cid)
-            # and exclude any bar that starts at 16:00 on the previous day
-            prev_close = get_price_at(cur, cid, prev_day, "16:00", inclusive=False)
+    if commit:
+        conn.commit()
+    logging.info("Inserted/updated %d rows into daily_reference_prices for %s", count, symbol_code)
+    return count
 
-        rows.append((symbol_code, day, price_open, price_close, prev_close))
 
-    if not rows:
-        logging.info("No reference price rows to insert for %s", symbol_code)
-        return 0
+def ensure_reference_table(conn: sqlite3.Connection) -> None:
+    """
+    Rebuild daily_reference_prices as a WITHOUT ROWID table on databases created before it was one. The rows then
+    live in the (symbol_code, trade_date) primary-key B-tree, so an upsert writes one B-tree instead of the table
+    plus its key index, and the old covering index idx_drp_sym_date (dropped with the old table) is not needed.
+    """
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'daily_reference_prices'"
+    ).fetchone()
+    if row is None or "WITHOUT ROWID" in row[0].upper():
+        return
+    logging.info("Rebuilding daily_reference_prices as a WITHOUT ROWID table")
+    conn.executescript(
+        """
+        BEGIN;
+        CREATE TABLE daily_reference_prices_new (
+            symbol_code TEXT,
+            trade_date  TEXT,
+            price_open  REAL,
+            price_close REAL,
+            prev_close  REAL,
+            PRIMARY KEY (symbol_code, trade_date)
+        ) WITHOUT ROWID;
+        INSERT INTO daily_reference_prices_new (symbol_code, trade_date, price_open, price_close, prev_close)
+            SELECT symbol_code, trade_date, price_open, price_close, prev_close FROM daily_reference_prices;
+        DROP TABLE daily_reference_prices;
+        ALTER TABLE daily_reference_prices_new RENAME TO daily_reference_prices;
+        COMMIT;
+        """
+    )
 
-    if dry_run:
-        logging.info("Dry run: would insert %d rows for %s", len(rows), symbol_code)
-        return len(rows)
 
-    inserted = upsert_reference_prices(cur, rows)
-    conn.commit()
-    logging.info("Inserted/updated %d rows into daily_reference_prices for %s", inserted, symbol_code)
-    return inserted
+def tune_connection(conn: sqlite3.Connection, write: bool = True) -> None:
+    """
+    Bulk compute settings: temp data in memory, ~200 MB page cache, 256 MB mmap. With write=True also
+    WAL + NORMAL sync; WAL is a persistent property of the database file, so dry runs pass write=False.
+    """
+    if write:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-200000")
+    conn.execute("PRAGMA mmap_size=268435456")
 
 
 def main(argv=None):
@@ -215,6 +211,7 @@ def main(argv=None):
                         format="%(asctime)s %(levelname)s %(message)s")
 
     conn = sqlite3.connect(args.db)
+    tune_connection(conn, write=not args.dry_run)
     try:
         if args.dry_run:
             # Run inside a transaction and roll back to avoid writes
@@ -227,6 +224,7 @@ def main(argv=None):
                 cur.execute("ROLLBACK")
             logging.info("Dry run complete: %d rows would have been written.", count)
         else:
+            ensure_reference_table(conn)
             count = process_symbol(conn, args.symbol, dry_run=False)
     finally:
         conn.close()
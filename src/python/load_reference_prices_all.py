@@ -9,8 +9,9 @@ import argparse
 import logging
 import sqlite3
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable, List, Optional, Tuple
 
 # Ensure project `src` root is on sys.path when executed
 _script_dir = Path(__file__).resolve().parent
@@ -19,7 +20,8 @@ if str(_project_src) not in sys.path:
     sys.path.insert(0, str(_project_src))
 
 from python.config import DB_PATH
-from python.load_reference_prices import process_symbol
+from python.load_reference_prices import (ensure_reference_table, process_symbol, select_reference_prices,
+                                          tune_connection, upsert_reference_prices)
 
 
 def fetch_all_symbols(cur: sqlite3.Cursor) -> List[str]:
@@ -33,16 +35,46 @@ def fetch_all_symbols(cur: sqlite3.Cursor) -> List[str]:
     return [r[0] for r in cur.fetchall()]
 
 
-def process_symbols(conn: sqlite3.Connection, symbols: Iterable[str], dry_run: bool = False) -> int:
-    total = 0
-    for sym in symbols:
-        logging.info("Processing symbol %s", sym)
-        try:
-            count = process_symbol(conn, sym, dry_run=dry_run)
-            logging.info("Symbol %s: %d rows (dry_run=%s)", sym, count, dry_run)
-            total += count
-        except Exception:
-            logging.exception("Failed processing symbol %s (continuing)", sym)
+def _read_symbol(db_path: str, symbol_code: str) -> List[Tuple[str, str, Optional[float], Optional[float], Optional[float]]]:
+    """Worker: compute one symbol's reference prices on its own read-only connection."""
+    conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+    try:
+        return select_reference_prices(conn, symbol_code)
+    finally:
+        conn.close()
+
+
+def process_symbols(conn: sqlite3.Connection, symbols: Iterable[str], dry_run: bool = False,
+                    db_path: Optional[str] = None, workers: int = 1) -> int:
+    """
+    Process all symbols in one write transaction (committed once at the end) instead of one per symbol.
+    With workers > 1 (and db_path given) the symbols are computed in a process pool on read-only connections,
+    and this process stays the only writer, upserting each symbol's rows as they arrive.
+    """
+    symbols = list(symbols)
+    if not dry_run and not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and db_path and len(symbols) > 1 else None
+    try:
+        futures = {sym: executor.submit(_read_symbol, db_path, sym) for sym in symbols} if executor else {}
+        total = 0
+        for sym in symbols:
+            logging.info("Processing symbol %s", sym)
+            try:
+                if executor is None:
+                    count = process_symbol(conn, sym, dry_run=dry_run, commit=False)
+                else:
+                    rows = futures[sym].result()
+                    count = len(rows) if dry_run else upsert_reference_prices(conn.cursor(), rows)
+                logging.info("Symbol %s: %d rows (dry_run=%s)", sym, count, dry_run)
+                total += count
+            except Exception:
+                logging.exception("Failed processing symbol %s (continuing)", sym)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if not dry_run:
+        conn.commit()
     return total
 
 
@@ -54,6 +86,9 @@ def main(argv=None):
         nargs="*",
         help="Optional list of symbol codes to process (e.g. --symbols ES GC). If omitted all symbols from liquid_contract_daily are processed."
     )
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of processes computing symbols on read-only connections "
+                             "(default: 1, everything runs inside SQLite in this process).")
     parser.add_argument("--dry-run", action="store_true", help="compute but do not modify the database (runs inside a transaction and rolls back)")
     parser.add_argument("-v", "--verbose", action="store_true", help="enable debug logging")
     args = parser.parse_args(argv)
@@ -62,6 +97,7 @@ def main(argv=None):
                         format="%(asctime)s %(levelname)s %(message)s")
 
     conn = sqlite3.connect(args.db)
+    tune_connection(conn, write=not args.dry_run)
     try:
         cur = conn.cursor()
         if args.symbols:
@@ -79,13 +115,13 @@ def main(argv=None):
             conn.isolation_level = None
             cur.execute("BEGIN")
             try:
-                total = process_symbols(conn, symbols, dry_run=True)
+                total = process_symbols(conn, symbols, dry_run=True, db_path=args.db, workers=args.workers)
             finally:
                 cur.execute("ROLLBACK")
             logging.info("Dry run complete: would have written %d rows (summed across symbols).", total)
         else:
-            total = process_symbols(conn, symbols, dry_run=False)
-            conn.commit()
+            ensure_reference_table(conn)
+            total = process_symbols(conn, symbols, dry_run=False, db_path=args.db, workers=args.workers)
             logging.info("Finished: %d rows written (summed across symbols).", total)
     finally:
         conn.close()
@@ -1,7 +1,7 @@
 # python
 """
 Load `data/futs_roll_info.csv` into existing `rollover_rules` table.
-Skips the header row. Columns expected:
+Skips a header row if present; rows are streamed from the file into the upsert. Columns expected:
   Symbol,Description,RolloverDays,RolloverType
 """
 from __future__ import annotations
@@ -11,6 +11,7 @@ import logging
 import sqlite3
 import sys
 from pathlib import Path
+from typing import Iterable, Iterator
 
 # Ensure project `src` root is on sys.path so we can import config
 _script_dir = Path(__file__).resolve().parent
@@ -23,37 +24,34 @@ from python.config import DB_PATH
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 
-def csv_path() -> Path:
-    # script at src/python -> project root = parents[2]
-    return Path(__file__).resolve().parents[2] / "data" / "futs_roll_info.csv"
+# script at src/python -> project root is the parent of `src`; resolved once, at import
+_CSV_PATH = _project_src.parent / "data" / "futs_roll_info.csv"
 
 
-def parse_csv(p: Path) -> list[tuple[str, str, int, str]]:
-    rows: list[tuple[str, str, int, str]] = []
+def iter_rows(p: Path) -> Iterator[tuple[str, str, int, str]]:
+    # Rows are cleaned as csv.reader produces them and yielded one at a time, so they stream straight
+    # into executemany; missing trailing cells become "" and extra cells are ignored
     with p.open(newline="", encoding="utf-8") as fh:
-        reader = csv.reader(fh)
-        for i, r in enumerate(reader):
+        for i, r in enumerate(csv.reader(fh)):
             if not r:
                 continue
-            # skip header (first row) or rows where first cell looks like header
+            # skip header (first row) when its first cell looks like a header
             if i == 0 and r[0].strip().lower() in ("symbol", "symbol_code"):
                 continue
             symbol = r[0].strip()
             if not symbol:
                 continue
             desc = r[1].strip() if len(r) > 1 else ""
+            # rollover days: integers only; blank or invalid -> 0
             try:
                 days = int(r[2]) if len(r) > 2 and r[2].strip() != "" else 0
             except ValueError:
                 days = 0
             rtype = r[3].strip() if len(r) > 3 else ""
-            rows.append((symbol, desc, days, rtype))
-    return rows
+            yield symbol, desc, days, rtype
 
 
-def upsert_into_db(db_path: str, rows: list[tuple[str, str, int, str]]) -> int:
-    if not rows:
-        return 0
+def upsert_into_db(db_path: str, rows: Iterable[tuple[str, str, int, str]]) -> int:
     conn = sqlite3.connect(db_path)
     try:
         cur = conn.cursor()
@@ -75,17 +73,16 @@ def upsert_into_db(db_path: str, rows: list[tuple[str, str, int, str]]) -> int:
 
 
 def main():
-    p = csv_path()
+    p = _CSV_PATH
     if not p.exists():
         logging.error("CSV not found at `%s`.", p)
         return 2
 
-    rows = parse_csv(p)
-    if not rows:
+    count = upsert_into_db(DB_PATH, iter_rows(p))
+    if not count:
         logging.error("No rows parsed from `%s`.", p)
         return 2
 
-    count = upsert_into_db(DB_PATH, rows)
     logging.info("Inserted/updated %d rows into `rollover_rules` from `%s`.", count, p)
     return 0
 
@@ -3,23 +3,17 @@ from pathlib import Path
 
 MONTH_CODES = "FGHJKMNQUVXZ"  # standard futures month codes
 
+# <symbol><month code><2-digit year>, e.g. 'ADF18' -> ('AD', 'F', '18'). Continuous contracts have no
+# year → anything that doesn’t end with 3 chars [LetterDigitDigit] does not match.
+_CONTRACT_STEM = re.compile(rf"(.*)([{MONTH_CODES}])([0-9]{{2}})", re.DOTALL)
 
-def parse_contract_filename(filename: str):
-    # Strip extension
-    stem = Path(filename).stem  # e.g. 'ADF18'
-    # Continuous contracts have no year → ignore anything that doesn’t end with 3 chars [LetterDigitDigit]
-    if len(stem) < 3:
-        return None
-
-    month_code = stem[-3]  # e.g. 'F'
-    year_two = stem[-2:]  # e.g. '18'
 
-    if month_code not in MONTH_CODES or not year_two.isdigit():
+def parse_contract_filename(filename: str):
+    # Strip extension, e.g. 'ADF18'
+    match = _CONTRACT_STEM.fullmatch(Path(filename).stem)
+    if match is None:
         # Probably continuous contract or something else → ignore
         return None
 
-    symbol_code = stem[:-3]  # e.g. 'AD'
-    year = 2000 + int(year_two)  # works for 2000–2099
-
-    return symbol_code, month_code, year
-
+    symbol_code, month_code, year_two = match.groups()
+    return symbol_code, month_code, 2000 + int(year_two)  # works for 2000–2099
@@ -16,6 +16,10 @@ CREATE TABLE contracts (
     last_trade_date  DATE                      -- populated from data
 );
 
+/* Per-symbol contract lookups (liquid contract selection by expiry window) */
+CREATE INDEX idx_contracts_sym_last
+    ON contracts (symbol_code, last_trade_date);
+
 /* Create bars table */
 CREATE TABLE bars_5min (
     contract_id  INTEGER NOT NULL REFERENCES contracts(contract_id),
@@ -45,7 +49,9 @@ CREATE TABLE liquid_contract_daily (
 );
 
 
-/* Table to hold daily reference prices for each symbol */
+/* Table to hold daily reference prices for each symbol.
+   WITHOUT ROWID: rows live in the (symbol_code, trade_date) key B-tree itself, so an upsert writes one
+   B-tree and per-symbol reads are range searches on it (no separate covering index needed) */
 CREATE TABLE daily_reference_prices (
     symbol_code TEXT,
     trade_date  TEXT,
@@ -53,4 +59,4 @@ CREATE TABLE daily_reference_prices (
     price_close REAL,   -- P(T, 16:00, T)
     prev_close  REAL,   -- P(T-1*, 16:00, T)
     PRIMARY KEY (symbol_code, trade_date)
-);
\ No newline at end of file
+) WITHOUT ROWID;
@@ -0,0 +1,101 @@
+# tests/test_calc_overnight_stats.py
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# ensure src/ is on sys.path so we can import the package without installing
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from python.calc_overnight_stats import compute_all_reference_stats, compute_reference_stats
+
+SCHEMA = Path(__file__).resolve().parents[1] / "src" / "sql" / "create_tables.sql"
+
+PRICES = {
+    # (trade_date, price_open, price_close, prev_close)
+    "ES": [
+        ("2024-03-04", 100.0, 101.0, None),   # no prev_close: no intraday, overnight or full return
+        ("2024-03-05", 102.0, 103.0, 101.0),
+        ("2024-03-06", 104.0, 105.0, 0.0),    # zero prev_close: no overnight (nor full) return
+        ("2024-03-07", 106.0, 105.0, 105.0),
+    ],
+    "NQ": [
+        ("2024-03-04", 200.0, 202.0, 199.0),
+        ("2024-03-05", 203.0, 201.0, 202.0),
+    ],
+}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "stats.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA.read_text())
+    conn.execute("INSERT INTO rollover_rules VALUES ('ES', 'E-MINI S&P 500', 8, 'before contract expiration')")
+    conn.executemany("INSERT INTO daily_reference_prices VALUES (?, ?, ?, ?, ?)",
+                     [(sym, *row) for sym, rows in PRICES.items() for row in rows])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _expected_stats(log_returns):
+    simple = np.expm1(log_returns)
+    final = np.exp(np.sum(log_returns))
+    annual_mean = final ** (252 / len(simple)) - 1.0
+    annual_std = simple.std(ddof=1) * np.sqrt(252)
+    return [final, simple.mean() * 100, annual_mean * 100, annual_std * 100, annual_mean / annual_std]
+
+
+def test_compute_reference_stats(db_path):
+    display_df, numeric_df, returns_df, cum_df = compute_reference_stats(
+        db_path, "ES", "2024-01-01", "2024-12-31", return_returns=True)
+
+    label = "E-MINI S&P 500 (ES) stats"
+    assert list(numeric_df.columns) == [(label, "Full"), (label, "Intraday"), (label, "Overnight")]
+    intraday = np.log([103 / 102, 105 / 104, 105 / 106])
+    overnight = np.log([102 / 101, 106 / 105])
+    full = np.log([103 / 101, 1.0])
+    np.testing.assert_allclose(numeric_df[(label, "Full")], _expected_stats(full), atol=1e-12)
+    np.testing.assert_allclose(numeric_df[(label, "Intraday")], _expected_stats(intraday))
+    np.testing.assert_allclose(numeric_df[(label, "Overnight")], _expected_stats(overnight))
+    assert display_df.iloc[0].tolist() == [f"{v:.3f}" for v in numeric_df.iloc[0]]
+
+    nan = np.nan
+    np.testing.assert_allclose(returns_df.to_numpy(), [
+        [nan, nan, nan],
+        [np.log(103 / 101), np.log(103 / 102), np.log(102 / 101)],
+        [nan, np.log(105 / 104), nan],
+        [0.0, np.log(105 / 106), np.log(106 / 105)],
+    ], atol=1e-15)
+
+    # 1.0 up to and including the first return, missing days carry the accumulated value forward
+    assert list(cum_df.index.strftime("%Y-%m-%d")) == [row[0] for row in PRICES["ES"]]
+    np.testing.assert_allclose(cum_df.to_numpy(), [
+        [1.0, 1.0, 1.0],
+        [1.0, 1.0, 1.0],
+        [103 / 101, 103 / 102 * 105 / 104, 102 / 101],
+        [103 / 101, 103 / 102 * 105 / 104 * 105 / 106, 102 / 101 * 106 / 105],
+    ])
+
+
+def test_compute_reference_stats_empty_range(db_path):
+    display_df, numeric_df, returns_df, cum_df = compute_reference_stats(db_path, "ES", "2030-01-01", "2030-12-31")
+    assert returns_df is None
+    assert numeric_df.isna().all().all()
+    assert (display_df == "nan").all().all()
+    assert cum_df.empty
+
+
+def test_compute_all_matches_per_symbol(db_path):
+    all_stats = compute_all_reference_stats(db_path, ["ES", "NQ", "CL"], return_returns=True)
+    assert sorted(all_stats) == ["ES", "NQ"]  # CL has no rows
+    for symbol, batch in all_stats.items():
+        single = compute_reference_stats(db_path, symbol, "0000-01-01", "9999-12-31", return_returns=True)
+        for batch_df, single_df in zip(batch, single):
+            pd.testing.assert_frame_equal(batch_df, single_df)
+    # no description in rollover_rules: the symbol is used instead
+    assert all_stats["NQ"][1].columns[0][0] == "NQ (NQ) stats"
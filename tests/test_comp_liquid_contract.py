@@ -0,0 +1,82 @@
+# tests/test_comp_liquid_contract.py
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+# ensure src/ is on sys.path so we can import the package without installing
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from python import comp_liquid_contract
+from python.comp_liquid_contract import (_select_winners, _select_winners_polars, compute_liquid_contracts,
+                                         compute_liquid_contracts_all)
+
+SCHEMA = Path(__file__).resolve().parents[1] / "src" / "sql" / "create_tables.sql"
+
+# Winners for the fixture below (expiry window 100 days, min volume 1500, open window 10:00-10:30)
+EXPECTED = [
+    ("ES", "2023-12-06", 1),  # first day of contract 1's expiry window
+    ("ES", "2024-03-13", 1),  # volume tie between contracts 1 and 2 -> lower contract_id
+    ("ES", "2024-03-15", 2),  # last day of contract 1's window; open-window bar from the non-winning contract
+    ("ES", "2024-03-20", 2),  # winner volume exactly at the minimum
+    ("NQ", "2024-03-13", 3),  # ranked separately from ES
+]
+
+
+@pytest.fixture(autouse=True)
+def _config(monkeypatch):
+    monkeypatch.setattr(comp_liquid_contract, "MAX_DAYS_TO_LAST_DAY", 100)
+    monkeypatch.setattr(comp_liquid_contract, "MIN_DAILY_VOLUME", 1500)
+    monkeypatch.setattr(comp_liquid_contract, "REQUIRED_OPEN_START", "10:00")
+    monkeypatch.setattr(comp_liquid_contract, "REQUIRED_OPEN_END", "10:30")
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA.read_text())
+    conn.executemany("INSERT INTO symbols VALUES (?, ?)", [("ES", "E-MINI S&P 500"), ("NQ", "E-MINI NASDAQ 100")])
+    conn.executemany("INSERT INTO contracts (contract_id, symbol_code, month_code, year, kibot_filename, last_trade_date) "
+                     "VALUES (?, ?, ?, 2024, ?, ?)",
+                     [(1, "ES", "H", "ESH24.txt", "2024-03-15"),  # expiry window from 2023-12-06
+                      (2, "ES", "M", "ESM24.txt", "2024-06-21"),  # expiry window from 2024-03-13
+                      (3, "NQ", "H", "NQH24.txt", "2024-03-15"),
+                      (4, "ES", "U", "ESU24.txt", None)])         # no last_trade_date: never considered
+    bars = [
+        (1, "2023-12-05 10:00", 5000),  # one day before contract 1's window
+        (1, "2023-12-06 10:00", 2000),
+        (1, "2024-03-13 10:00", 2000), (2, "2024-03-13 10:00", 2000),
+        # winner below the minimum volume: no row for the day
+        (1, "2024-03-14 10:00", 1000), (2, "2024-03-14 10:05", 1499),
+        (1, "2024-03-15 10:00", 1600), (2, "2024-03-15 15:00", 3000),
+        # contract 1 is past its last_trade_date, so its 10:00 bar does not open the day for contract 2
+        (1, "2024-03-18 10:00", 9000), (2, "2024-03-18 11:00", 2000),
+        # no bar inside the open window (10:30 is past its end)
+        (2, "2024-03-19 09:30", 2000), (2, "2024-03-19 10:30", 2000),
+        (2, "2024-03-20 10:25", 1500), (4, "2024-03-20 10:00", 9999),
+        (3, "2024-03-13 10:00", 1700),
+    ]
+    conn.executemany("INSERT INTO bars_5min (contract_id, timestamp, open, high, low, close, volume) "
+                     "VALUES (?, ?, 1, 1, 1, 1, ?)", bars)
+    conn.commit()
+    return conn
+
+
+def test_select_winners():
+    conn = _db()
+    assert list(_select_winners(conn)) == EXPECTED
+    assert list(_select_winners(conn, "ES")) == [row for row in EXPECTED if row[0] == "ES"]
+
+
+def test_compute_liquid_contracts_stores_winners():
+    conn = _db()
+    compute_liquid_contracts(conn, "NQ")
+    assert conn.execute("SELECT * FROM liquid_contract_daily").fetchall() == [("NQ", "2024-03-13", 3)]
+    compute_liquid_contracts_all(conn)
+    assert conn.execute("SELECT * FROM liquid_contract_daily ORDER BY symbol_code, trade_date").fetchall() == EXPECTED
+
+
+def test_polars_engine_matches_sqlite():
+    pytest.importorskip("polars")
+    conn = _db()
+    assert _select_winners_polars(conn) == list(_select_winners(conn))
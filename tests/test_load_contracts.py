@@ -0,0 +1,44 @@
+# tests/test_load_contracts.py
+import sqlite3
+import sys
+from pathlib import Path
+
+# ensure src/ is on sys.path so we can import the package without installing
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from python.load_contracts import load_bars_for_file, parse_bar_file
+
+SCHEMA = Path(__file__).resolve().parents[1] / "src" / "sql" / "create_tables.sql"
+
+
+def test_parse_bar_file(tmp_path):
+    p = tmp_path / "ESH24.txt"
+    # CRLF line endings, a blank line in the middle and at the end, a blank volume
+    p.write_bytes(b"12/29/2023,16:00,4800.25,4801.00,4799.50,4800.75,1234\r\n"
+                  b"\r\n"
+                  b"01/02/2024,09:30,4801.00,4802.50,4800.00,4802.25,\r\n"
+                  b"\r\n")
+    assert parse_bar_file(p) == (
+        ["2023-12-29 16:00", "2024-01-02 09:30"],
+        [4800.25, 4801.0],
+        [4801.0, 4802.5],
+        [4799.5, 4800.0],
+        [4800.75, 4802.25],
+        [1234, None],
+    )
+
+
+def test_parse_empty_bar_file(tmp_path):
+    p = tmp_path / "ESH24.txt"
+    p.write_bytes(b"")
+    assert parse_bar_file(p) == ([], [], [], [], [], [])
+
+
+def test_load_bars_for_file_stores_null_volume(tmp_path):
+    p = tmp_path / "ESH24.txt"
+    p.write_bytes(b"01/02/2024,09:30,4801.00,4802.50,4800.00,4802.25,\r\n")
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA.read_text())
+    load_bars_for_file(conn, p, contract_id=1)
+    assert conn.execute("SELECT contract_id, timestamp, open, high, low, close, volume FROM bars_5min").fetchall() == [
+        (1, "2024-01-02 09:30", 4801.0, 4802.5, 4800.0, 4802.25, None)]
@@ -0,0 +1,72 @@
+# tests/test_load_reference_prices.py
+import sqlite3
+import sys
+from pathlib import Path
+
+# ensure src/ is on sys.path so we can import the package without installing
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from python.load_reference_prices import ensure_reference_table, process_symbol, _BATCH_PRICES_SQL
+
+SCHEMA = Path(__file__).resolve().parents[1] / "src" / "sql" / "create_tables.sql"
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(SCHEMA.read_text())
+    conn.execute("INSERT INTO symbols VALUES ('ES', 'E-MINI S&P 500')")
+    conn.executemany("INSERT INTO contracts (contract_id, symbol_code, month_code, year, kibot_filename) "
+                     "VALUES (?, 'ES', ?, 2024, ?)", [(1, "H", "ESH24.txt"), (2, "M", "ESM24.txt")])
+    bars = [
+        # contract 1: 09:30 bar present; 16:00 bar must not be used for the close
+        (1, "2024-03-04 09:25", 10.0, 11.0), (1, "2024-03-04 09:30", 12.0, 13.0),
+        (1, "2024-03-04 15:55", 14.0, 15.0), (1, "2024-03-04 16:00", 16.0, 17.0),
+        # contract 1: no 09:30 bar -> open falls back to the 09:25 close
+        (1, "2024-03-05 09:25", 20.0, 21.0), (1, "2024-03-05 15:50", 22.0, 23.0),
+        # contract 2 (liquid from 03-06): prev_close comes from contract 2 on 03-05
+        (2, "2024-03-05 15:55", 30.0, 31.0),
+        (2, "2024-03-06 09:30", 32.0, 33.0), (2, "2024-03-06 15:55", 34.0, 35.0),
+    ]
+    conn.executemany("INSERT INTO bars_5min (contract_id, timestamp, open, high, low, close, volume) "
+                     "VALUES (?, ?, ?, ?, ?, ?, 1)", [(c, ts, o, o, o, cl) for c, ts, o, cl in bars])
+    conn.executemany("INSERT INTO liquid_contract_daily VALUES ('ES', ?, ?)",
+                     [("2024-03-04", 1), ("2024-03-05", 1), ("2024-03-06", 2)])
+    conn.commit()
+    return conn
+
+
+def test_process_symbol_reference_prices():
+    conn = _db()
+    assert process_symbol(conn, "ES") == 3
+    rows = conn.execute("SELECT * FROM daily_reference_prices ORDER BY trade_date").fetchall()
+    assert [tuple(r) for r in rows] == [
+        ("ES", "2024-03-04", 12.0, 15.0, None),
+        ("ES", "2024-03-05", 21.0, 23.0, 15.0),
+        ("ES", "2024-03-06", 32.0, 35.0, 31.0),
+    ]
+
+
+def test_price_lookups_are_primary_key_searches():
+    conn = _db()
+    plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + _BATCH_PRICES_SQL, ("ES",))]
+    bar_steps = [step for step in plan if step.split()[1] == "b"]
+    assert bar_steps and all(step.startswith("SEARCH b USING INDEX") for step in bar_steps)
+    # the symbol's trade days come from the (symbol_code, trade_date) primary key, not a scan
+    assert any(step.startswith("SEARCH") and "USING INDEX sqlite_autoindex_liquid_contract_daily_1" in step
+               for step in plan)
+
+
+def test_ensure_reference_table_rebuilds_rowid_table():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE daily_reference_prices (symbol_code TEXT, trade_date TEXT, price_open REAL,
+                                             price_close REAL, prev_close REAL, PRIMARY KEY (symbol_code, trade_date));
+        CREATE INDEX idx_drp_sym_date
+            ON daily_reference_prices (symbol_code, trade_date, price_open, price_close, prev_close);
+        INSERT INTO daily_reference_prices VALUES ('ES', '2024-03-04', 12.0, 15.0, NULL);
+    """)
+    ensure_reference_table(conn)
+    objects = conn.execute("SELECT name, sql FROM sqlite_master").fetchall()
+    assert [name for name, _ in objects] == ["daily_reference_prices"]
+    assert objects[0][1].endswith("WITHOUT ROWID")
+    assert conn.execute("SELECT * FROM daily_reference_prices").fetchall() == [("ES", "2024-03-04", 12.0, 15.0, None)]
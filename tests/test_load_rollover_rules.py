@@ -0,0 +1,69 @@
+# tests/test_load_rollover_rules.py
+import sqlite3
+import sys
+from pathlib import Path
+
+# ensure src/ is on sys.path so we can import the package without installing
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from python.load_rollover_rules import iter_rows, upsert_into_db
+
+SCHEMA = Path(__file__).resolve().parents[1] / "src" / "sql" / "create_tables.sql"
+
+
+def test_iter_rows_cleans_and_truncates_rows(tmp_path):
+    p = tmp_path / "futs_roll_info.csv"
+    p.write_text(
+        "Symbol,Description,RolloverDays,RolloverType\n"
+        "AD, AUSTRALIAN DOLLAR ,2,before contract expiration\n"
+        "\n"
+        "ES,E-MINI S&P 500,,on contract expiration\n"         # blank days
+        "GC,GOLD,5.0,from end of prior month\n"              # non-integer days
+        "JY,JAPANESE YEN,x,before contract expiration\n"     # non-integer days
+        "NG,NATURAL GAS\n"                                   # short row
+        "CL,CRUDE OIL, 8 ,before contract expiration,\n"     # stray trailing comma
+        "SI,SILVER,3,before contract expiration,extra,cells\n"
+        " ,BLANK SYMBOL,4,on contract expiration\n",
+        encoding="utf-8",
+    )
+    assert list(iter_rows(p)) == [
+        ("AD", "AUSTRALIAN DOLLAR", 2, "before contract expiration"),
+        ("ES", "E-MINI S&P 500", 0, "on contract expiration"),
+        ("GC", "GOLD", 0, "from end of prior month"),
+        ("JY", "JAPANESE YEN", 0, "before contract expiration"),
+        ("NG", "NATURAL GAS", 0, ""),
+        ("CL", "CRUDE OIL", 8, "before contract expiration"),
+        ("SI", "SILVER", 3, "before contract expiration"),
+    ]
+
+
+def test_iter_rows_without_header_or_rows(tmp_path):
+    p = tmp_path / "futs_roll_info.csv"
+    p.write_text("AD,AUSTRALIAN DOLLAR\n", encoding="utf-8")
+    assert list(iter_rows(p)) == [("AD", "AUSTRALIAN DOLLAR", 0, "")]
+    p.write_text("", encoding="utf-8")
+    assert list(iter_rows(p)) == []
+
+
+def test_upsert_streams_rows_from_csv(tmp_path):
+    db_path = str(tmp_path / "rules.sqlite3")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA.read_text())
+    conn.execute("INSERT INTO rollover_rules VALUES ('ES', 'OLD', 1, 'old')")
+    conn.commit()
+    conn.close()
+
+    p = tmp_path / "futs_roll_info.csv"
+    p.write_text("Symbol,Description,RolloverDays,RolloverType\n"
+                 "ES,E-MINI S&P 500,8,before contract expiration\n"
+                 "GC,GOLD,2,from end of prior month\n", encoding="utf-8")
+    rows = iter_rows(p)
+    assert upsert_into_db(db_path, rows) == 2
+    assert next(rows, None) is None  # executemany consumed the generator
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT * FROM rollover_rules ORDER BY symbol_code").fetchall() == [
+        ("ES", "E-MINI S&P 500", 8, "before contract expiration"),
+        ("GC", "GOLD", 2, "from end of prior month"),
+    ]
+    conn.close()
@@ -13,4 +13,11 @@ def test_parse_contract_filename_valid():
 
 
 def test_parse_contract_filename_invalid():
-    assert parse_contract_filename("CONTINUOUS") is None
\ No newline at end of file
+    assert parse_contract_filename("CONTINUOUS") is None
+
+
+def test_parse_contract_filename_month_and_year_checks():
+    assert parse_contract_filename("ESZ25.txt") == ("ES", "Z", 2025)
+    assert parse_contract_filename("ESA25.txt") is None  # not a month code
+    assert parse_contract_filename("ESZ5.txt") is None   # one-digit year
+    assert parse_contract_filename("ES.txt") is None
@@ -0,0 +1,48 @@
+# tests/test_stats_core.py
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# ensure src/ is on sys.path so we can import the package without installing
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from python._stats_core import TRADING_DAYS, compute, log_returns, log_table_stats
+
+
+def test_compute_matches_numpy():
+    nan = np.nan
+    log_arr = np.array([[nan, nan], [0.01, nan], [nan, nan], [-0.02, nan], [0.03, nan]])
+    final, daily_mean, daily_std, cum, count = compute(log_arr)
+
+    valid = log_arr[~np.isnan(log_arr[:, 0]), 0]
+    assert count.tolist() == [3, 0]
+    assert np.isclose(final[0], np.exp(valid.sum()))
+    assert np.isclose(daily_mean[0], np.expm1(valid).mean())
+    assert np.isclose(daily_std[0], np.expm1(valid).std(ddof=1))
+    np.testing.assert_allclose(cum[:, 0], [1.0, 1.0, np.exp(0.01), np.exp(-0.01), np.exp(0.02)])
+
+    # column without any return
+    assert np.isnan(final[1]) and np.isnan(daily_std[1]) and np.isnan(cum[:, 1]).all()
+
+
+def test_log_table_stats_annualizes():
+    log_arr = np.array([[0.01], [np.nan], [-0.02], [0.03]])
+    stats, cum = log_table_stats(log_arr)
+
+    simple = np.expm1([0.01, -0.02, 0.03])
+    annual_mean = np.exp(0.02) ** (TRADING_DAYS / 3) - 1.0
+    annual_std = simple.std(ddof=1) * np.sqrt(TRADING_DAYS)
+    np.testing.assert_allclose(stats[:, 0], [np.exp(0.02), simple.mean() * 100, annual_mean * 100,
+                                             annual_std * 100, annual_mean / annual_std])
+    np.testing.assert_allclose(cum[:, 0], [1.0, np.exp(0.01), np.exp(-0.01), np.exp(0.02)])
+
+
+def test_log_returns_masks_missing_and_zero_prices():
+    nan = np.nan
+    po = np.array([100.0, 102.0, 104.0, 0.0, nan])
+    pc = np.array([101.0, 103.0, 105.0, 5.0, 5.0])
+    pp = np.array([nan, 101.0, 0.0, 5.0, 5.0])
+    intraday, overnight = log_returns(po, pc, pp)
+    np.testing.assert_allclose(intraday, [nan, np.log(103 / 102), np.log(105 / 104), nan, nan])
+    np.testing.assert_allclose(overnight, [nan, np.log(102 / 101), nan, -np.inf, nan])